@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# Measures end to end latency of `mud complete-branch-all` on a synthetic fleet, the way a shell calls
+# it on every key press. The first run builds .mudcache-branches, the following ones read it.
+#
+#   python benchmarks/bench_completion.py [--repos 500] [--branches 20]
+
+import os
+import sys
+import time
+import tempfile
+import argparse
+import subprocess
+
+from fleet import make_fleet
+
+SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+
+def measure(root: str, home: str, *args: str) -> float:
+	env = os.environ | {'HOME': home, 'PYTHONPATH': SOURCE}
+	start = time.perf_counter()
+	subprocess.run([sys.executable, '-m', 'mud', *args], cwd=root, env=env, stdout=subprocess.DEVNULL, check=True)
+	return time.perf_counter() - start
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description='Benchmarks shell completion latency.')
+	parser.add_argument('--repos', default=500, type=int, help='Number of repositories.')
+	parser.add_argument('--branches', default=20, type=int, help='Branches per repository.')
+	parser.add_argument('--rounds', default=5, type=int, help='Best of N warm rounds is reported.')
+	args = parser.parse_args()
+
+	with tempfile.TemporaryDirectory() as root, tempfile.TemporaryDirectory() as home:
+		make_fleet(root, repos=args.repos, branches=args.branches, commits=1, files=1, tags=0, stashes=0, modified=0, untracked=0)
+		cold = measure(root, home, 'complete-branch-all')
+		warm = min(measure(root, home, 'complete-branch-all', 'feature/1') for _ in range(args.rounds))
+		filtered = measure(root, home, '-L=none', 'complete-branch-all')
+		print(f'{"complete-branch-all, cold":<28} {cold * 1000:>8.1f}ms')
+		print(f'{"complete-branch-all, warm":<28} {warm * 1000:>8.1f}ms')
+		print(f'{"filtered path":<28} {filtered * 1000:>8.1f}ms')
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# Compares repository discovery of `mud init` against the previous os.walk over every directory, on a
+# synthetic tree where every repository carries a dependency directory, the way node_modules does.
+#
+#   python benchmarks/bench_init.py [--repos 200] [--depth 3] [--width 6]
+
+import os
+import sys
+import time
+import tempfile
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from mud.cache import Cache
+from mud.discovery import RepositoryFinder
+
+
+def make_tree(root: str, repos: int, depth: int, width: int) -> None:
+	for index in range(repos):
+		path = os.path.join(root, f'group_{index % 10}', f'repo_{index:04}')
+		os.makedirs(os.path.join(path, '.git'))
+		# Dependency trees with width ** depth directories each
+		directories = [os.path.join(path, 'node_modules')]
+		for _ in range(depth):
+			directories = [os.path.join(directory, f'd{branch}') for directory in directories for branch in range(width)]
+		for directory in directories:
+			os.makedirs(directory)
+
+
+def walk(root: str) -> list[str]:
+	repos = []
+	for current, dirs, _ in os.walk(root, topdown=True):
+		if '.git' in dirs:
+			repos.append(os.path.relpath(current, root))
+			dirs.remove('.git')
+		dirs[:] = [d for d in dirs if not d.startswith('.')]
+	return sorted(repos)
+
+
+def find(root: str, cache_path: str, refresh: bool) -> list[str]:
+	finder = RepositoryFinder(cache=Cache(cache_path), refresh=refresh)
+	try:
+		return finder.find(root)
+	finally:
+		finder.close()
+
+
+def measure(function, *args) -> tuple[float, list[str]]:
+	start = time.perf_counter()
+	result = function(*args)
+	return time.perf_counter() - start, result
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description='Benchmarks repository discovery of mud init.')
+	parser.add_argument('--repos', default=200, type=int, help='Number of repositories.')
+	parser.add_argument('--depth', default=3, type=int, help='Depth of each dependency tree.')
+	parser.add_argument('--width', default=6, type=int, help='Subdirectories per dependency directory.')
+	args = parser.parse_args()
+
+	with tempfile.TemporaryDirectory() as root, tempfile.TemporaryDirectory() as cache_directory:
+		make_tree(root, args.repos, args.depth, args.width)
+		cache_path = os.path.join(cache_directory, '.mudcache-discovery')
+
+		walked, expected = measure(walk, root)
+		found, repos = measure(find, root, cache_path, False)
+		refreshed, refreshed_repos = measure(find, root, cache_path, True)
+		assert repos == expected and refreshed_repos == expected
+
+		print(f'{"os.walk":<24} {walked * 1000:>8.1f}ms')
+		print(f'{"RepositoryFinder":<24} {found * 1000:>8.1f}ms')
+		print(f'{"RepositoryFinder refresh":<24} {refreshed * 1000:>8.1f}ms')
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# Measures how the parallel inspection engine scales with the number of repositories.
+#
+#   python benchmarks/bench_inspect.py [--repos 10,50,200] [--jobs 1,4,16]
+
+import os
+import sys
+import time
+import tempfile
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from mud import inspector
+from mud.inspector import Inspector
+from mud.settings import DEFAULT_JOBS
+
+from fleet import make_fleet
+
+
+def measure(paths: list[str], jobs: int, rounds: int) -> float:
+	best = float('inf')
+	for _ in range(rounds):
+		start = time.perf_counter()
+		Inspector(jobs).map(inspector.inspect_status, paths)
+		best = min(best, time.perf_counter() - start)
+	return best
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description='Benchmarks Inspector.map over synthetic repositories.')
+	parser.add_argument('--repos', default='10,50,200', help='Comma separated repository counts.')
+	parser.add_argument('--jobs', default=f'1,4,{DEFAULT_JOBS}', help='Comma separated worker counts.')
+	parser.add_argument('--rounds', default=3, type=int, help='Best of N rounds is reported.')
+	args = parser.parse_args()
+
+	repo_counts = [int(value) for value in args.repos.split(',')]
+	job_counts = [int(value) for value in args.jobs.split(',')]
+
+	print(f'{"repos":>6} ' + ' '.join(f'{f"jobs={jobs}":>10}' for jobs in job_counts) + f' {"speedup":>8}')
+	with tempfile.TemporaryDirectory() as root:
+		# A dirty file per repository so status has something to report
+		fleet = make_fleet(root, repos=max(repo_counts), files=20, commits=1, branches=0, tags=0, stashes=0, modified=1, untracked=0)
+		paths = [os.path.join(root, path) for path in fleet]
+		for count in repo_counts:
+			timings = [measure(paths[:count], jobs, args.rounds) for jobs in job_counts]
+			row = ' '.join(f'{timing * 1000:>8.1f}ms' for timing in timings)
+			print(f'{count:>6} {row} {timings[0] / timings[-1]:>7.2f}x')
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# Compares the single pass reference indexer with the former per-command scans on repositories with
+# many references. References are written straight into packed-refs, the way large mirrors store them.
+#
+#   python benchmarks/bench_refs.py [--refs 1000,10000,50000]
+
+import os
+import sys
+import time
+import tempfile
+import argparse
+
+from pygit2 import Repository, Signature, init_repository
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from mud import inspector
+
+
+def make_repo(path: str, refs: int) -> str:
+	signature = Signature('Bench User', 'bench@example.com')
+	repo: Repository = init_repository(path)
+	commit = repo.create_commit('HEAD', signature, signature, 'Initial commit', repo.index.write_tree(), [])
+	repo.remotes.create('origin', 'https://example.com/origin.git')
+	repo.remotes.create('upstream', 'https://example.com/upstream.git')
+
+	kinds = ['refs/heads/feature', 'refs/remotes/origin/feature', 'refs/remotes/upstream/feature', 'refs/tags/v1.']
+	with open(os.path.join(path, '.git', 'packed-refs'), 'w') as file:
+		file.write('# pack-refs with: peeled fully-peeled sorted \n')
+		for name in sorted(f'{kinds[index % len(kinds)]}{index}' for index in range(refs)):
+			file.write(f'{commit} {name}\n')
+	return path
+
+
+# The previous implementation: one scan for local branches, one for remote ones, looking up the
+# first remote for every reference
+def legacy_branches(path: str) -> None:
+	repo = Repository(path)
+	[ref.replace('refs/heads/', '') for ref in repo.references if ref.startswith('refs/heads/')]
+	[ref.replace('refs/remotes/' + repo.remotes[0].name + '/', '') for ref in repo.references if ref.startswith('refs/remotes/' + repo.remotes[0].name + '/')]
+
+
+def indexed_branches(path: str) -> None:
+	inspector.index_references(path)
+
+
+def measure(function, path: str, rounds: int) -> float:
+	best = float('inf')
+	for _ in range(rounds):
+		start = time.perf_counter()
+		function(path)
+		best = min(best, time.perf_counter() - start)
+	return best
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description='Benchmarks reference enumeration for mud branches.')
+	parser.add_argument('--refs', default='1000,10000,50000', help='Comma separated reference counts.')
+	parser.add_argument('--rounds', default=3, type=int, help='Best of N rounds is reported.')
+	args = parser.parse_args()
+
+	print(f'{"refs":>6} {"legacy":>10} {"indexed":>10} {"speedup":>8}')
+	with tempfile.TemporaryDirectory() as root:
+		for count in [int(value) for value in args.refs.split(',')]:
+			path = make_repo(os.path.join(root, f'repo_{count}'), count)
+			legacy = measure(legacy_branches, path, args.rounds)
+			indexed = measure(indexed_branches, path, args.rounds)
+			print(f'{count:>6} {legacy * 1000:>8.1f}ms {indexed * 1000:>8.1f}ms {legacy / indexed:>7.2f}x')
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# Measures the formatting helpers behind `mud status` rows: path, branch, origin sync, stash, labels
+# and a modified file per row. The first pass starts with empty memos, the second one repeats the same
+# rows the way the live table redraws them on every frame.
+#
+#   python benchmarks/bench_render.py [--rows 100000]
+
+import os
+import sys
+import time
+import tempfile
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+BRANCHES = ['main', 'develop', 'feature/login', 'feature/search', 'bugfix/crash', 'release/2.0', 'test/flaky']
+
+
+def make_rows(count: int) -> list[dict]:
+	return [{
+		'path': f'group_{index % 100}/repo_{index:06}',
+		'head': {'kind': 'branch', 'name': BRANCHES[index % len(BRANCHES)], 'target': ''},
+		'sync': {'upstream': 'origin/main', 'ahead': index % 3, 'behind': index % 2},
+		'stashes': index % 4,
+		'labels': ['backend', 'services'] if index % 2 else ['frontend'],
+		'file': f'src/module_{index % 500}/file_{index}.py',
+	} for index in range(count)]
+
+
+def render(runner, rows: list[dict]) -> None:
+	from mud.utils import link
+	from mud.styles import YELLOW
+
+	for row in rows:
+		repo_path = os.path.abspath(row['path'])
+		[
+			link(runner._get_formatted_path(row['path']), repo_path),
+			runner._get_head_info(row['head']),
+			runner._get_origin_sync(row['head'], row['sync']),
+			runner._stash_count(row['stashes']),
+			runner._get_formatted_labels(row['labels']),
+			link(runner._get_formatted_path(row['file'], False, YELLOW), os.path.join(repo_path, row['file'])),
+		]
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description='Benchmarks status row formatting.')
+	parser.add_argument('--rows', default=100000, type=int, help='Number of rows.')
+	args = parser.parse_args()
+
+	with tempfile.TemporaryDirectory() as home:
+		os.environ['HOME'] = home
+		from mud import utils
+		from mud.settings import Settings
+		from mud.runner import Runner
+
+		utils.settings = Settings(utils.SETTINGS_FILE_NAME, utils.OLD_SETTINGS_FILE_NAME)
+		utils.profile = utils.RenderProfile(utils.settings)
+		rows = make_rows(args.rows)
+
+		for name in 'cold', 'warm':
+			start = time.perf_counter()
+			render(Runner, rows)
+			elapsed = time.perf_counter() - start
+			print(f'{name:<6} {elapsed * 1000:>9.1f}ms  {elapsed / len(rows) * 1e9:>7.0f}ns/row')
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# Measures wall time of scheduled subprocess runs against the jobs limit for a synthetic fleet.
+#
+#   python benchmarks/bench_scheduler.py [--repos 200] [--jobs 1,4,16,64] [--command "sleep 0.05"]
+
+import os
+import sys
+import time
+import asyncio
+import tempfile
+import argparse
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from mud.scheduler import Scheduler
+
+
+def make_fleet(root: str, count: int) -> list[str]:
+	paths = []
+	for index in range(count):
+		path = os.path.join(root, f'repo_{index:04}')
+		os.makedirs(path)
+		paths.append(path)
+	return paths
+
+
+async def run(paths: list[str], jobs: int, command: str) -> None:
+	async def task(path: str) -> None:
+		process = await asyncio.create_subprocess_shell(command, cwd=path, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+		await process.wait()
+
+	await Scheduler(jobs).run(paths, task)
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description='Benchmarks Scheduler.run over a synthetic fleet.')
+	parser.add_argument('--repos', default=200, type=int, help='Number of repositories.')
+	parser.add_argument('--jobs', default='1,4,16,64', help='Comma separated jobs limits.')
+	parser.add_argument('--command', default='sleep 0.05', help='Command to run in every repository.')
+	args = parser.parse_args()
+
+	print(f'{args.repos} repos, command: {args.command}')
+	print(f'{"jobs":>6} {"wall":>10} {"repos/s":>10}')
+	with tempfile.TemporaryDirectory() as root:
+		paths = make_fleet(root, args.repos)
+		for jobs in [int(value) for value in args.jobs.split(',')]:
+			start = time.perf_counter()
+			asyncio.run(run(paths, jobs, args.command))
+			elapsed = time.perf_counter() - start
+			print(f'{jobs:>6} {elapsed * 1000:>8.1f}ms {args.repos / elapsed:>10.1f}')
+
+
+if __name__ == '__main__':
+	main()
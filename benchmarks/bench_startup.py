@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# Measures import time of every command with `python -X importtime` and checks it against the budget
+# tracked in startup_budget.json. Commands also list modules they must not load, which catches an
+# eager import of pygit2, asyncio or prettytable regardless of machine speed.
+#
+#   python benchmarks/bench_startup.py [--rounds 5] [--update]
+
+import os
+import re
+import sys
+import json
+import tempfile
+import argparse
+import subprocess
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+SOURCE = os.path.join(BENCHMARKS, '..', 'src')
+BUDGET_FILE = os.path.join(BENCHMARKS, 'startup_budget.json')
+IMPORT_LINE = re.compile(r'^import time:\s+(\d+) \|\s+\d+ \|( *)(\S+)$')
+
+COMMANDS = {
+	'get-config': ['get-config'],
+	'labels': ['labels'],
+	'status': ['status'],
+	'log': ['log'],
+	'branches': ['branches'],
+	'run-ordered': ['-a', 'true'],
+	'run-async': ['-t', 'true'],
+	'run-table': ['true'],
+	'complete-branch-all': ['complete-branch-all'],
+}
+
+
+def make_fleet(root: str) -> None:
+	for name in 'repo_a', 'repo_b':
+		path = os.path.join(root, name)
+		os.makedirs(path)
+		for command in ['git init -q', 'git -c user.name=Bench -c user.email=bench@example.com commit -q --allow-empty -m Initial']:
+			subprocess.run(command, shell=True, cwd=path, check=True)
+	with open(os.path.join(root, '.mudconfig'), 'w') as file:
+		file.write('repo_a\t\nrepo_b\t\n')
+
+
+# Returns the total import time in milliseconds and the set of imported top level packages
+def measure(root: str, home: str, args: list[str]) -> tuple[float, set[str]]:
+	env = os.environ | {'HOME': home, 'PYTHONPATH': SOURCE}
+	process = subprocess.run([sys.executable, '-X', 'importtime', '-m', 'mud', *args], cwd=root, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+	total = 0
+	modules = set()
+	for line in process.stderr.splitlines():
+		match = IMPORT_LINE.match(line)
+		if match:
+			total += int(match.group(1))
+			modules.add(match.group(3).split('.')[0])
+	return total / 1000, modules
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description='Checks per command import time against startup_budget.json.')
+	parser.add_argument('--rounds', default=5, type=int, help='Best of N rounds is reported.')
+	parser.add_argument('--update', action='store_true', help='Rewrites the budgets from this run with 50%% headroom.')
+	args = parser.parse_args()
+
+	with open(BUDGET_FILE, 'r') as file:
+		budgets = json.load(file)
+
+	failed = False
+	print(f'{"command":<22} {"imports":>9} {"budget":>9}  status')
+	with tempfile.TemporaryDirectory() as root, tempfile.TemporaryDirectory() as home:
+		make_fleet(root)
+		for name, command in COMMANDS.items():
+			samples = [measure(root, home, command) for _ in range(args.rounds)]
+			elapsed = min(sample[0] for sample in samples)
+			modules = samples[-1][1]
+			budget = budgets.setdefault(name, {'import_ms': 0, 'absent': []})
+
+			loaded = sorted(module for module in budget['absent'] if module in modules)
+			if args.update:
+				budget['import_ms'] = round(elapsed * 1.5)
+			status = 'ok'
+			if loaded:
+				status = f'imports {", ".join(loaded)}'
+			elif elapsed > budget['import_ms']:
+				status = 'over budget'
+			failed = failed or status != 'ok'
+			print(f'{name:<22} {elapsed:>7.1f}ms {budget["import_ms"]:>7}ms  {status}')
+
+	if args.update:
+		with open(BUDGET_FILE, 'w') as file:
+			json.dump(budgets, file, indent='\t')
+			file.write('\n')
+	sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# Compares a warm `mud status` with `mud --no-cache status` on a fleet where the cached part of status
+# has real work behind it: main is far ahead of origin/main, so ahead/behind walks a long history, and
+# every other repository is detached at an annotated tag, so its head is looked up in the tag index.
+# Changed files are listed on every run either way. Exits with an error when the warm run isn't faster.
+#
+#   python benchmarks/bench_status_cache.py [--repos 50] [--commits 2000] [--tags 200] [--rounds 5]
+
+import os
+import sys
+import tempfile
+import argparse
+import statistics
+
+from pygit2 import Repository
+
+from fleet import make_fleet
+from suite import measure
+
+
+def prepare(root: str, paths: list[str], commits: int) -> None:
+	for index, path in enumerate(paths):
+		repo = Repository(os.path.join(root, path))
+		repo.references['refs/remotes/origin/main'].set_target(repo.revparse_single(f'main~{commits - 1}').id)
+		if index % 2:
+			tag = repo.references['refs/tags/v0.1.0'].peel(None)
+			repo.set_head(tag.id)
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description='Benchmarks the status cache against --no-cache.')
+	parser.add_argument('--repos', default=50, type=int, help='Number of repositories.')
+	parser.add_argument('--commits', default=2000, type=int, help='Commits main is ahead of origin/main.')
+	parser.add_argument('--tags', default=200, type=int, help='Tags per repository, every other one annotated.')
+	parser.add_argument('--rounds', default=5, type=int, help='Runs per mode, the median is reported.')
+	args = parser.parse_args()
+
+	with tempfile.TemporaryDirectory() as root, tempfile.TemporaryDirectory() as home:
+		paths = make_fleet(root, repos=args.repos, commits=args.commits, files=20, branches=0, tags=args.tags, stashes=1, modified=1, untracked=1, diverged=0.0)
+		prepare(root, paths, args.commits)
+
+		# Fills the cache
+		measure(root, home, 'status')
+		cold = statistics.median(measure(root, home, '--no-cache', 'status') for _ in range(args.rounds))
+		warm = statistics.median(measure(root, home, 'status') for _ in range(args.rounds))
+
+	print(f'{"--no-cache":<12} {cold * 1000:>8.1f}ms')
+	print(f'{"warm":<12} {warm * 1000:>8.1f}ms')
+	print(f'{"speedup":<12} {cold / warm:>8.2f}x')
+	if warm >= cold:
+		sys.exit('The warm run is not faster than --no-cache')
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# Generates a synthetic fleet of repositories for the benchmarks. The same options and seed always give
+# the same commits, refs and worktree changes, so results of different commits can be compared.
+#
+# Every repository gets `files` tracked files under a few top-level directories, a linear history of
+# `commits` commits on main, `branches` local branches at random commits with every other one pushed
+# to origin, `tags` tags alternating lightweight and annotated, `stashes` stash entries and finally
+# `modified` changed tracked files and `untracked` new files. main of a `diverged` share of the
+# repositories has a sibling commit on origin, so it is both ahead and behind.
+#
+#   python benchmarks/fleet.py <directory> [--repos 100] [--commits 50] ...
+
+import os
+import sys
+import random
+import argparse
+
+from pygit2 import Repository, Signature, init_repository
+from pygit2.enums import ObjectType
+
+# Signatures carry fixed times, so generated object ids are the same on every run
+EPOCH = 1700000000
+BRANCH_PREFIXES = ['feature', 'bugfix', 'release']
+LABELS = [['backend'], ['frontend'], ['backend', 'services']]
+DIRECTORIES = 8
+
+DEFAULTS = {
+	'repos': 100,
+	'commits': 50,
+	'files': 200,
+	'branches': 10,
+	'tags': 10,
+	'stashes': 1,
+	'modified': 5,
+	'untracked': 2,
+	'diverged': 0.25,
+	'seed': 0,
+}
+
+
+def add_arguments(parser: argparse.ArgumentParser, **defaults) -> None:
+	defaults = DEFAULTS | defaults
+	parser.add_argument('--repos', default=defaults['repos'], type=int, help='Number of repositories.')
+	parser.add_argument('--commits', default=defaults['commits'], type=int, help='Commits on main of every repository.')
+	parser.add_argument('--files', default=defaults['files'], type=int, help='Tracked files per repository.')
+	parser.add_argument('--branches', default=defaults['branches'], type=int, help='Local branches per repository.')
+	parser.add_argument('--tags', default=defaults['tags'], type=int, help='Tags per repository.')
+	parser.add_argument('--stashes', default=defaults['stashes'], type=int, help='Stash entries per repository.')
+	parser.add_argument('--modified', default=defaults['modified'], type=int, help='Modified tracked files per repository.')
+	parser.add_argument('--untracked', default=defaults['untracked'], type=int, help='Untracked files per repository.')
+	parser.add_argument('--diverged', default=defaults['diverged'], type=float, help='Share of repositories whose main diverged from origin.')
+	parser.add_argument('--seed', default=defaults['seed'], type=int, help='Seed of the generator.')
+
+
+def options(args: argparse.Namespace) -> dict:
+	return {key: getattr(args, key) for key in DEFAULTS}
+
+
+def make_fleet(root: str, **spec) -> list[str]:
+	spec = DEFAULTS | spec
+	paths = []
+	rows = []
+	for index in range(spec['repos']):
+		path = f'group_{index % 10}/repo_{index:04}'
+		make_repo(os.path.join(root, path), index, spec)
+		paths.append(path)
+		rows.append(f'{path}\t{",".join(LABELS[index % len(LABELS)])}\n')
+	with open(os.path.join(root, '.mudconfig'), 'w') as file:
+		file.write(''.join(rows))
+	return paths
+
+
+def make_repo(path: str, index: int, spec: dict) -> Repository:
+	rng = random.Random(f'{spec["seed"]}:{index}')
+	repo = init_repository(path, initial_head='main', origin_url=f'https://example.com/fleet/repo_{index:04}.git')
+	repo.config['user.name'] = 'Bench User'
+	repo.config['user.email'] = 'bench@example.com'
+	files = [f'dir_{number % DIRECTORIES}/file_{number:05}.txt' for number in range(max(spec['files'], 1))]
+	for name in files:
+		write(path, name, f'{index}:{name}\n')
+	repo.index.add_all()
+
+	commits = []
+	parents = []
+	for number in range(max(spec['commits'], 1)):
+		if number > 0:
+			name = rng.choice(files)
+			write(path, name, f'{index}:{name}:{number}\n')
+			repo.index.add(name)
+		signature = _signature(number)
+		commit = repo.create_commit('refs/heads/main', signature, signature, f'Commit {number}', repo.index.write_tree(), parents)
+		commits.append(commit)
+		parents = [commit]
+	repo.index.write()
+
+	head = commits[-1]
+	origin_main = head
+	if len(commits) > 1 and rng.random() < spec['diverged']:
+		signature = _signature(len(commits))
+		origin_main = repo.create_commit(None, signature, signature, 'Pushed elsewhere', repo[commits[-2]].tree.id, [commits[-2]])
+	repo.references.create('refs/remotes/origin/main', origin_main)
+	repo.branches.local['main'].upstream = repo.branches.remote['origin/main']
+
+	for number in range(spec['branches']):
+		name = f'{BRANCH_PREFIXES[number % len(BRANCH_PREFIXES)]}/{index % 50}-{number}'
+		branch = repo.branches.local.create(name, repo[rng.choice(commits)])
+		if number % 2 == 0:
+			repo.references.create(f'refs/remotes/origin/{name}', branch.target)
+			branch.upstream = repo.branches.remote[f'origin/{name}']
+
+	for number in range(spec['tags']):
+		target = commits[min(len(commits) - 1, number * len(commits) // max(spec['tags'], 1))]
+		if number % 2 == 0:
+			repo.references.create(f'refs/tags/v{number // 10}.{number % 10}.0', target)
+		else:
+			repo.create_tag(f'v{number // 10}.{number % 10}.0', target, ObjectType.COMMIT, _signature(number), f'Release {number}')
+
+	for number in range(spec['stashes']):
+		write(path, files[number % len(files)], f'stashed {number}\n')
+		repo.stash(_signature(number), f'Stash {number}')
+
+	for name in rng.sample(files, min(spec['modified'], len(files))):
+		write(path, name, f'{index}:{name}:modified\n')
+	for number in range(spec['untracked']):
+		write(path, f'dir_{number % DIRECTORIES}/new_{number:05}.txt', f'{index}:new:{number}\n')
+	return repo
+
+
+def write(root: str, name: str, text: str) -> None:
+	path = os.path.join(root, name)
+	os.makedirs(os.path.dirname(path), exist_ok=True)
+	with open(path, 'w') as file:
+		file.write(text)
+
+
+def _signature(number: int) -> Signature:
+	return Signature('Bench User', 'bench@example.com', EPOCH + number * 60, 0)
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description='Generates a synthetic fleet of repositories with a .mudconfig.')
+	parser.add_argument('directory', help='Directory to generate the fleet in, must not exist yet.')
+	add_arguments(parser)
+	args = parser.parse_args()
+
+	if os.path.exists(args.directory):
+		sys.exit(f'{args.directory} already exists')
+	paths = make_fleet(args.directory, **options(args))
+	print(f'{len(paths)} repositories in {os.path.abspath(args.directory)}')
+
+
+if __name__ == '__main__':
+	main()
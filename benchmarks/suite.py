@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# Times every native command, the expensive filters and the three run modes end to end on a generated
+# fleet, see fleet.py. Every case is run once without the cache and then `--rounds` times with a warm
+# cache, the median of the warm runs is what gets compared. Results are written as JSON along with the
+# fleet options and the commit they were measured at.
+#
+#   python benchmarks/suite.py [--repos 100] [--commits 50] ... [--cases status,run]
+#   python benchmarks/suite.py --compare benchmarks/results/<commit>.json [--threshold 0.1]
+
+import os
+import sys
+import json
+import time
+import platform
+import tempfile
+import argparse
+import subprocess
+import statistics
+
+from fleet import add_arguments, options, make_fleet
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+SOURCE = os.path.join(BENCHMARKS, '..', 'src')
+RESULTS_DIRECTORY = os.path.join(BENCHMARKS, 'results')
+RESULTS_VERSION = 1
+RUN_COMMAND = 'git rev-parse HEAD'
+
+CASES = {
+	'status': ['status'],
+	'log': ['log'],
+	'info': ['info'],
+	'branch': ['branch'],
+	'remote-branch': ['remote-branch'],
+	'tags': ['tags'],
+	'complete-branch-all': ['complete-branch-all'],
+	'filter modified': ['-m', 'status'],
+	'filter diverged': ['-d', 'status'],
+	'filter branch': ['-b=main', 'status'],
+	# Default settings run commands asynchronously in the table view, -t and -a toggle that off
+	'run ordered': ['-a', RUN_COMMAND],
+	'run async': ['-t', RUN_COMMAND],
+	'run table': [RUN_COMMAND],
+}
+
+
+def measure(root: str, home: str, *args: str) -> float:
+	env = os.environ | {'HOME': home, 'PYTHONPATH': SOURCE, 'COLUMNS': '200'}
+	start = time.perf_counter()
+	subprocess.run([sys.executable, '-m', 'mud', *args], cwd=root, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+	return time.perf_counter() - start
+
+
+def run_case(root: str, home: str, args: list[str], rounds: int) -> dict:
+	cold = measure(root, home, '--no-cache', *args)
+	# Fills the cache, later runs only read it
+	measure(root, home, *args)
+	samples = [measure(root, home, *args) for _ in range(rounds)]
+	return {
+		'cold_ms': round(cold * 1000, 2),
+		'warm_ms': round(statistics.median(samples) * 1000, 2),
+		'samples_ms': [round(sample * 1000, 2) for sample in samples],
+	}
+
+
+def git_commit() -> str:
+	result = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=BENCHMARKS, capture_output=True, text=True)
+	return result.stdout.strip() if result.returncode == 0 else 'unknown'
+
+
+# Prints the warm time of every case next to the baseline and returns the cases that got slower than threshold
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+	if baseline.get('fleet') != results['fleet']:
+		print(f'Fleet options differ from the baseline, {baseline.get("fleet")} vs {results["fleet"]}')
+	regressions = []
+	print(f'{"case":<22} {"baseline":>10} {"current":>10} {"change":>8}')
+	for name, result in results['cases'].items():
+		before = baseline.get('cases', {}).get(name)
+		if before is None:
+			print(f'{name:<22} {"":>10} {result["warm_ms"]:>8.1f}ms')
+			continue
+		change = result['warm_ms'] / before['warm_ms'] - 1 if before['warm_ms'] else 0.0
+		mark = ' !' if change > threshold else ''
+		print(f'{name:<22} {before["warm_ms"]:>8.1f}ms {result["warm_ms"]:>8.1f}ms {change:>+7.1%}{mark}')
+		if change > threshold:
+			regressions.append(name)
+	return regressions
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description='Benchmarks mud commands on a generated fleet.')
+	add_arguments(parser)
+	parser.add_argument('--rounds', default=5, type=int, help='Warm runs per case, the median is reported.')
+	parser.add_argument('--cases', default='', help='Comma separated substrings, only matching cases run.')
+	parser.add_argument('--output', default='', help='Results file, benchmarks/results/<commit>.json by default.')
+	parser.add_argument('--compare', default='', help='Results file to compare against.')
+	parser.add_argument('--threshold', default=0.1, type=float, help='Slowdown of the warm median counted as a regression.')
+	args = parser.parse_args()
+
+	selected = [value for value in args.cases.split(',') if value]
+	cases = {name: case for name, case in CASES.items() if not selected or any(value in name for value in selected)}
+	commit = git_commit()
+	results = {
+		'version': RESULTS_VERSION,
+		'commit': commit,
+		'python': platform.python_version(),
+		'platform': platform.platform(),
+		'cpus': os.cpu_count(),
+		'fleet': options(args),
+		'rounds': args.rounds,
+		'cases': {},
+	}
+
+	with tempfile.TemporaryDirectory() as root, tempfile.TemporaryDirectory() as home:
+		start = time.perf_counter()
+		make_fleet(root, **options(args))
+		print(f'Generated {args.repos} repositories in {time.perf_counter() - start:.1f}s')
+		print(f'{"case":<22} {"cold":>10} {"warm":>10}')
+		for name, case in cases.items():
+			result = run_case(root, home, case, args.rounds)
+			results['cases'][name] = result
+			print(f'{name:<22} {result["cold_ms"]:>8.1f}ms {result["warm_ms"]:>8.1f}ms')
+
+	output = args.output or os.path.join(RESULTS_DIRECTORY, f'{commit[:12]}.json')
+	os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+	with open(output, 'w') as file:
+		json.dump(results, file, indent='\t')
+	print(f'Results written to {output}')
+
+	if args.compare:
+		with open(args.compare) as file:
+			baseline = json.load(file)
+		regressions = compare(results, baseline, args.threshold)
+		if regressions:
+			sys.exit(f'Slower than {args.compare} by more than {args.threshold:.0%}: {", ".join(regressions)}')
+
+
+if __name__ == '__main__':
+	main()
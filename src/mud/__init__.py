@@ -1,18 +1,28 @@
 #!/usr/bin/env python3
 
-import mud.utils
-import mud.settings
+import sys
 
-from mud.app import App
+from mud.commands import COMPLETE_BRANCH, COMPLETE_BRANCH_ALL
 
 
 def run():
 	try:
+		# Completion is answered before the rest of mud, and pygit2 with it, gets imported
+		if len(sys.argv) > 1 and sys.argv[1] in COMPLETE_BRANCH + COMPLETE_BRANCH_ALL:
+			from mud import completion
+			completion.run(sys.argv[1] in COMPLETE_BRANCH_ALL, sys.argv[2] if len(sys.argv) > 2 else '')
+			return
+
+		from mud import utils, settings
+		from mud.app import App
+
 		utils.settings = settings.Settings(utils.SETTINGS_FILE_NAME, utils.OLD_SETTINGS_FILE_NAME)
+		utils.profile = utils.RenderProfile(utils.settings)
 
 		app: App = App()
 		app.run()
 	except KeyboardInterrupt:
+		from mud import utils
 		utils.print_error(0)
 
 
@@ -1,40 +1,57 @@
+from __future__ import annotations
+
 import os
 import sys
-import asyncio
 
-from mud import utils
+from typing import Any, Dict, List, Tuple, TYPE_CHECKING
+
+from mud import utils, timings
+from mud.cache import Cache
 from mud.commands import *
 from mud.runner import Runner
 from mud.config import Config
-from argparse import ArgumentParser
-from pygit2 import Repository
+from mud.filters import FilterPipeline, CONFIG, FILESYSTEM, REFS, WORKTREE
+
+# argparse, asyncio and pygit2 are imported where they are needed, so commands that don't use them
+# start faster. benchmarks/bench_startup.py keeps track of it.
+if TYPE_CHECKING:
+	from argparse import ArgumentParser
 
 
 class App:
 	def __init__(self):
 		self.command: str | None = None
 		self.config: Config | None = None
-		self.parser: ArgumentParser = self._create_parser()
+		self.cache: Cache | None = None
+		self.cache_path: str = ''
+		self.stats: bool = False
+		self.timings: bool = False
+		self.trace_path: str = ''
+		self.format: str = ''
+		self.order: str = 'config'
+		self.split_files: int = 0
+		self.timeout: float = 0.0
+		self.deadline: float = 0.0
+		self.filter_timings: Dict[str, Tuple[float, int, int]] = {}
+		self._parser: ArgumentParser | None = None
+
+	@property
+	def parser(self) -> ArgumentParser:
+		if self._parser is None:
+			self._parser = self._create_parser()
+		return self._parser
 
 	@staticmethod
-	def _has_diverged_branch(repo: Repository) -> bool:
-		if repo.head_is_unborn or repo.head_is_detached:
-			return False
-
-		try:
-			local_ref = repo.branches[repo.head.shorthand]
-		except KeyError:
-			return False
-
-		upstream = local_ref.upstream
-		if upstream is None:
+	def _has_diverged_branch(sync: Dict[str, Any]) -> bool:
+		if sync['upstream'] is None:
 			return False
 
-		ahead, behind = repo.ahead_behind(local_ref.target, upstream.target)
-		return ahead != 0 or behind != 0
+		return sync['ahead'] != 0 or sync['behind'] != 0
 
 	@staticmethod
 	def _create_parser() -> ArgumentParser:
+		from argparse import ArgumentParser
+
 		parser = ArgumentParser(
 			description=f'mud allows you to run commands in multiple repositories.',
 			usage='%(prog)s [OPTIONS] [COMMAND] ...',
@@ -43,14 +60,20 @@ class App:
 
 		subparsers.add_parser(LOG[0], aliases=LOG[1:], help='Displays log of latest commit messages for all repositories in a table view.')
 		subparsers.add_parser(INFO[0], aliases=INFO[1:], help='Displays branch divergence and working directory changes')
-		subparsers.add_parser(INIT[0], aliases=INIT[1:], help='Initializes the .mudconfig and adds all repositories in this directory to .mudconfig.')
+		init_parser = subparsers.add_parser(INIT[0], aliases=INIT[1:], help='Initializes the .mudconfig and adds all repositories in this directory to .mudconfig.')
+		init_parser.add_argument('--max-depth', help='Only looks for repositories this many directories deep.', type=int, default=None)
+		init_parser.add_argument('--exclude', metavar='PATTERN', help='Skips directories matching this name pattern, can be repeated.', action='append', default=[])
+		init_parser.add_argument('--nested', action='store_true', help='Also looks for repositories inside other repositories.')
+		init_parser.add_argument('--refresh', action='store_true', help='Only lists directories again which changed since the last init.')
 		subparsers.add_parser(TAGS[0], aliases=TAGS[1:], help='Displays git tags in repositories.')
 		subparsers.add_parser(LABELS[0], aliases=LABELS[1:], help='Displays mud labels across repositories.')
 		subparsers.add_parser(STATUS[0], aliases=STATUS[1:], help='Displays working directory changes.')
 		subparsers.add_parser(BRANCHES[0], aliases=BRANCHES[1:], help='Displays all branches in repositories.')
 		subparsers.add_parser(REMOTE_BRANCHES[0], aliases=REMOTE_BRANCHES[1:], help='Displays all remote branches in repositories.')
-		subparsers.add_parser(COMPLETE_BRANCH[0], help='Prints unique current branch names across repositories for shell completion.')
-		subparsers.add_parser(COMPLETE_BRANCH_ALL[0], help='Prints unique local and remote branch names across repositories for shell completion.')
+		complete_branch_parser = subparsers.add_parser(COMPLETE_BRANCH[0], help='Prints unique current branch names across repositories for shell completion.')
+		complete_branch_parser.add_argument('prefix', nargs='?', default='', help='Only prints branch names starting with this prefix.')
+		complete_branch_all_parser = subparsers.add_parser(COMPLETE_BRANCH_ALL[0], help='Prints unique local and remote branch names across repositories for shell completion.')
+		complete_branch_all_parser.add_argument('prefix', nargs='?', default='', help='Only prints branch names starting with this prefix.')
 		subparsers.add_parser(CONFIGURE[0], aliases=CONFIGURE[1:], help='Runs the interactive configuration wizard.')
 		subparsers.add_parser(GET_CONFIG[0], aliases=GET_CONFIG[1:], help='Prints current .mudconfig path.')
 		subparsers.add_parser(SET_GLOBAL[0], aliases=SET_GLOBAL[1:], help='Sets .mudconfig in the current repository as your fallback .mudconfig.')
@@ -72,9 +95,19 @@ class App:
 		parser.add_argument(*NOT_LABEL_PREFIX, metavar='NOT_LABEL', help=f'Excludes repositories with provided label.', nargs='?', default='', type=str)
 		parser.add_argument(*BRANCH_PREFIX, metavar='BRANCH', help='Includes repositories on a provided branch.', nargs='?', default='', type=str)
 		parser.add_argument(*NOT_BRANCH_PREFIX, metavar='NOT_BRANCH', help='Excludes repositories on a provided branch.', nargs='?', default='', type=str)
+		parser.add_argument(*JOBS_PREFIX, metavar='JOBS', help='Limits how many repositories are inspected or run at the same time.', nargs='?', default='', type=str)
 		parser.add_argument(*MODIFIED_ATTR, action='store_true', help='Filters modified repositories.')
 		parser.add_argument(*DIVERGED_ATTR, action='store_true', help='Filters repositories with diverged branches.')
 		parser.add_argument(*ASYNC_ATTR, action='store_true', help='Switches asynchronous run feature.')
+		parser.add_argument(*STREAM_ATTR, action='store_true', help='Switches streaming of output lines as they arrive when table view is disabled, and of table rows of native commands.')
+		parser.add_argument(*ORDER_PREFIX, metavar='ORDER', help='Order of streamed table rows, config (default) or completion.', nargs='?', default='', type=str)
+		parser.add_argument(*NO_CACHE_ATTR, action='store_true', help='Ignores cached repository state and inspects every repository again.')
+		parser.add_argument(*STATS_ATTR, action='store_true', help='Prints cache, filter and renderer counters after the command.')
+		parser.add_argument(*FORMAT_PREFIX, metavar='FORMAT', help='Prints json, jsonl or tsv records instead of a table. jsonl prints every repository as soon as it is inspected.', nargs='?', default='', type=str)
+		parser.add_argument(*TIMINGS_ATTR, action='store_true', help='Prints the time spent in every phase and the slowest repositories after the command.')
+		parser.add_argument(*TRACE_PREFIX, metavar='FILE', help='Writes the phases of the run to a Chrome trace event file.', nargs='?', default='', type=str)
+		parser.add_argument(*TIMEOUT_PREFIX, metavar='SECONDS', help='Terminates a command that runs longer than this in a repository.', nargs='?', default='', type=str)
+		parser.add_argument(*DEADLINE_PREFIX, metavar='SECONDS', help='Terminates commands still running this long after the first one started, the rest are not started.', nargs='?', default='', type=str)
 		parser.add_argument('catch_all', help='Type any commands to execute among repositories.', nargs='*')
 		return parser
 
@@ -106,11 +139,14 @@ class App:
 			utils.configure()
 			return
 
+		self._read_timing_flags()
 		self.config = Config()
 
 		current_directory = os.getcwd()
-		config_directory, fallback = self.config.find()
+		with timings.span('config find'):
+			config_directory, fallback = self.config.find()
 		config_path = os.path.join(config_directory, utils.CONFIG_FILE_NAME)
+		self.cache_path = os.path.join(config_directory, utils.CACHE_FILE_NAME)
 
 		os.environ['PWD'] = config_directory
 
@@ -145,7 +181,15 @@ class App:
 						config_path = os.path.join(current_directory, utils.CONFIG_FILE_NAME)
 					elif config_path != '' and os.path.exists(config_path):
 						self.config.load(config_path)
-					self.config.init()
+					from mud.discovery import RepositoryFinder
+
+					exclude = utils.settings.mud_settings['init_exclude'].split(',') + args.exclude
+					discovery_cache = Cache(os.path.join(os.path.dirname(config_path) or current_directory, utils.DISCOVERY_CACHE_FILE_NAME))
+					finder = RepositoryFinder(exclude, args.max_depth, args.nested, discovery_cache, args.refresh)
+					try:
+						self.config.init(finder)
+					finally:
+						finder.close()
 					self.config.save(config_path)
 					return
 
@@ -168,10 +212,17 @@ class App:
 			if config_path == '':
 				utils.print_error(5, exit=True)
 
-			self.config.load(config_path)
+			self._load_config(config_path)
 			self._filter_with_arguments()
-
-			if len(self.repos) == 0:
+			runner.jobs = self.jobs
+			runner.cache = self.cache
+			runner.format = self.format
+			runner.stream = self.stream
+			runner.order = self.order
+			runner.split_files = self.split_files
+
+			# Records of no repositories are still valid output
+			if len(self.repos) == 0 and not self.format:
 				utils.print_error(1)
 				return
 
@@ -184,19 +235,26 @@ class App:
 			elif args.command in BRANCHES:
 				runner.branches(self.repos, False)
 			elif args.command in COMPLETE_BRANCH:
-				runner.complete_branches(self.repos, False)
+				runner.complete_branches(self.repos, False, args.prefix)
 			elif args.command in COMPLETE_BRANCH_ALL:
-				runner.complete_branches(self.repos, True)
+				runner.complete_branches(self.repos, True, args.prefix)
 			elif args.command in LABELS:
 				runner.labels(self.repos)
 			elif args.command in TAGS:
 				runner.tags(self.repos)
 			elif args.command in STATUS:
 				runner.status(self.repos)
+			self._save_cache()
+			self._print_stats(runner)
+			self._print_timings()
 		# Handling subcommands
 		else:
-			self.config.load(config_path)
+			self._load_config(config_path)
 			self._filter_with_arguments()
+			self._save_cache()
+			runner.jobs = self.jobs
+			runner.timeout = self.timeout
+			runner.deadline = self.deadline
 
 			del sys.argv[0]
 			if self.command is None:
@@ -207,8 +265,12 @@ class App:
 				self._parse_aliases()
 			try:
 				if self.run_async:
+					import asyncio
+
 					if self.table:
 						asyncio.run(runner.run_async_table_view(self.repos.keys(), self.command))
+					elif self.stream:
+						asyncio.run(runner.run_async_streamed(self.repos.keys(), self.command))
 					else:
 						asyncio.run(runner.run_async(self.repos.keys(), self.command))
 				else:
@@ -216,12 +278,47 @@ class App:
 			except Exception as ex:
 				print(ex)
 				utils.print_error(2)
+			self._print_stats(runner)
+			self._print_timings()
+
+	def _load_config(self, config_path: str) -> None:
+		snapshot_path = os.path.join(os.path.dirname(config_path), utils.CONFIG_SNAPSHOT_FILE_NAME)
+		with timings.span('config load'):
+			self.config.load_snapshot(config_path, snapshot_path, self._use_cache())
+
+	# --no-cache is read ahead of the other flags since the snapshot is needed to filter
+	@staticmethod
+	def _use_cache() -> bool:
+		for arg in sys.argv[1:]:
+			if not arg.startswith('-') or arg == '--':
+				break
+			if arg in NO_CACHE_ATTR:
+				return False
+		return True
+
+	# --timings and --trace= are read ahead as well, so that config lookup is measured too
+	def _read_timing_flags(self) -> None:
+		for arg in sys.argv[1:]:
+			if not arg.startswith('-') or arg == '--':
+				break
+			if arg in TIMINGS_ATTR:
+				self.timings = True
+			elif any(arg.startswith(prefix) for prefix in TRACE_PREFIX):
+				self.trace_path = arg.split('=', 1)[1]
+				if self.trace_path == '':
+					utils.print_error(13, exit=True)
+		timings.enabled = self.timings or self.trace_path != ''
 
 	# Filter out repositories if user provided filters
 	def _filter_with_arguments(self) -> None:
 		self.repos = self.config.data
 		self.table = utils.settings.config['mud'].getboolean('run_table', fallback=True)
 		self.run_async = utils.settings.config['mud'].getboolean('run_async', fallback=True)
+		self.stream = utils.settings.config['mud'].getboolean('run_stream', fallback=False)
+		max_jobs = str(utils.settings.mud_settings['max_jobs'])
+		self.jobs = int(max_jobs) if max_jobs.isdigit() else 0
+		split_files = str(utils.settings.mud_settings['split_status_files'])
+		self.split_files = int(split_files) if split_files.isdigit() else 0
 
 		for path, labels in self.config.filter_label('ignore', self.config.data).items():
 			del self.repos[path]
@@ -233,6 +330,7 @@ class App:
 		exclude_branches = []
 		modified = False
 		diverged = False
+		use_cache = True
 		index = 1
 		while index < len(sys.argv):
 			arg = sys.argv[index]
@@ -253,14 +351,39 @@ class App:
 				exclude_branches.append(arg.split('=', 1)[1])
 			elif any(arg.startswith(prefix) for prefix in NAME_PREFIX):
 				contains_strings.append(arg.split('=', 1)[1])
+			elif any(arg.startswith(prefix) for prefix in JOBS_PREFIX):
+				jobs = arg.split('=', 1)[1]
+				if not jobs.isdigit() or int(jobs) == 0:
+					utils.print_error(10, exit=True, meta=jobs)
+				self.jobs = int(jobs)
 			elif arg in MODIFIED_ATTR:
 				modified = True
 			elif arg in DIVERGED_ATTR:
 				diverged = True
+			elif arg in NO_CACHE_ATTR:
+				use_cache = False
+			elif arg in STATS_ATTR:
+				self.stats = True
+			elif arg in TIMINGS_ATTR or any(arg.startswith(prefix) for prefix in TRACE_PREFIX):
+				pass
+			elif any(arg.startswith(prefix) for prefix in TIMEOUT_PREFIX):
+				self.timeout = self._parse_seconds(arg.split('=', 1)[1])
+			elif any(arg.startswith(prefix) for prefix in DEADLINE_PREFIX):
+				self.deadline = self._parse_seconds(arg.split('=', 1)[1])
+			elif any(arg.startswith(prefix) for prefix in FORMAT_PREFIX):
+				self.format = arg.split('=', 1)[1]
+				if self.format not in ('json', 'jsonl', 'tsv'):
+					utils.print_error(11, exit=True, meta=self.format)
+			elif any(arg.startswith(prefix) for prefix in ORDER_PREFIX):
+				self.order = arg.split('=', 1)[1]
+				if self.order not in ('config', 'completion'):
+					utils.print_error(12, exit=True, meta=self.order)
 			elif arg in TABLE_ATTR:
 				self.table = not self.table
 			elif arg in ASYNC_ATTR:
 				self.run_async = not self.run_async
+			elif arg in STREAM_ATTR:
+				self.stream = not self.stream
 			elif any(arg.startswith(prefix) for prefix in COMMAND_ATTR):
 				self.command = arg.split('=', 1)[1]
 			else:
@@ -268,56 +391,94 @@ class App:
 				continue
 			del sys.argv[index]
 
+		with timings.span('cache load'):
+			self.cache = Cache(self.cache_path, use_cache)
 		directory = os.getcwd()
-		to_delete = []
 
-		for path, labels in self.repos.items():
-			abs_path = os.path.join(directory, path)
+		def has_repository(path: str, labels: List[str]) -> bool:
+			error = self.config.errors.get(path, 0)
+			if error:
+				utils.print_error(error, meta=path)
+			return error == 0
+
+		def matches_branch(path: str, labels: List[str]) -> bool:
+			from mud import inspector
+			from pygit2 import Repository
+
+			# Detached repositories match by the tag they are checked out at
+			head = inspector.get_head(Repository(os.path.join(directory, path)), self.cache)
+			if head['kind'] == 'unborn':
+				return True
+			if any(include_branches) and head['name'] not in include_branches:
+				return False
+			if any(exclude_branches) and head['name'] in exclude_branches:
+				return False
+			return True
+
+		# Only HEAD and the ahead/behind counts against its upstream, which are memoized per pair of commits
+		def has_diverged_branch(path: str, labels: List[str]) -> bool:
+			from mud import inspector
+			from pygit2 import Repository
+
+			return self._has_diverged_branch(inspector.get_origin_sync(Repository(os.path.join(directory, path)), self.cache))
+
+		pipeline = FilterPipeline(self.jobs)
+		if any(include_labels):
+			pipeline.add(CONFIG, 'label', lambda path, labels: any(item in include_labels for item in labels))
+		if any(exclude_labels):
+			pipeline.add(CONFIG, 'not-label', lambda path, labels: not any(item in exclude_labels for item in labels))
+		if any(contains_strings):
+			pipeline.add(CONFIG, 'name', lambda path, labels: any(substr in path for substr in contains_strings))
+		pipeline.add(FILESYSTEM, 'repository', has_repository)
+		if any(include_branches) or any(exclude_branches):
+			pipeline.add(REFS, 'branch', matches_branch)
+		if modified:
+			untracked = utils.settings.config['mud'].getboolean('modified_untracked', fallback=True)
+			from mud.inspector import is_dirty
+			pipeline.add(WORKTREE, 'modified', lambda path, labels: is_dirty(os.path.join(directory, path), untracked))
+		if diverged:
+			pipeline.add(REFS, 'diverged', has_diverged_branch)
+
+		self.repos = pipeline.run(self.repos)
+		self.filter_timings = pipeline.timings
 
-			if not os.path.isdir(abs_path):
-				utils.print_error(7, meta=path)
-				to_delete.append(path)
-				continue
-			elif not os.path.isdir(os.path.join(abs_path, '.git')):
-				utils.print_error(8, meta=path)
-				to_delete.append(path)
-				continue
-			elif not os.path.exists(abs_path):
-				utils.print_error(7, meta=path)
-				to_delete.append(path)
-				continue
-
-			repo = Repository(abs_path)
-			os.chdir(abs_path)
-			delete = False
-
-			if any(include_labels) and not any(item in include_labels for item in labels):
-				delete = True
-			if any(exclude_labels) and any(item in exclude_labels for item in labels):
-				delete = True
-			if any(contains_strings) and not any(substr in path for substr in contains_strings):
-				delete = True
-
-			if not delete and not repo.head_is_unborn and (any(include_branches) or any(exclude_branches)):
-				if any(include_branches) and repo.head.shorthand not in include_branches:
-					delete = True
-				if any(exclude_branches) and repo.head.shorthand in exclude_branches:
-					delete = True
-
-			if not delete and modified:
-				if not repo.head_is_unborn and not repo.status():
-					delete = True
-
-			if not delete and diverged and not self._has_diverged_branch(repo):
-				delete = True
-
-			if delete:
-				to_delete.append(path)
-
-		for path in to_delete:
-			del self.repos[path]
-
-		os.chdir(directory)
+	@staticmethod
+	def _parse_seconds(value: str) -> float:
+		try:
+			seconds = float(value)
+		except ValueError:
+			seconds = 0.0
+		if not seconds > 0 or seconds == float('inf'):
+			utils.print_error(14, exit=True, meta=value)
+		return seconds
+
+	def _save_cache(self) -> None:
+		if self.cache is not None:
+			with timings.span('cache save'):
+				self.cache.save()
+
+	def _print_stats(self, runner: Runner) -> None:
+		if not self.stats:
+			return
+		if self.cache is not None:
+			print(f'Cache: {self.cache.hits} hits, {self.cache.misses} misses', file=sys.stderr)
+		for stage, (elapsed, before, after) in self.filter_timings.items():
+			print(f'Filter {stage}: {elapsed * 1000:.1f} ms, {before} -> {after} repositories', file=sys.stderr)
+		# Only loaded when a status was inspected, so --stats doesn't pull in pygit2 on its own
+		inspector = sys.modules.get('mud.inspector')
+		if inspector is not None and inspector.split_repositories:
+			print(f'Split status: {len(inspector.split_repositories)} repositories', file=sys.stderr)
+		if runner.renderer is not None:
+			print(f'Renderer: {runner.renderer.frames} frames, {runner.renderer.dropped} dropped updates', file=sys.stderr)
+
+	def _print_timings(self) -> None:
+		if self.timings:
+			timings.report()
+		if self.trace_path:
+			try:
+				timings.save_trace(self.trace_path)
+			except OSError:
+				utils.print_error(13, meta=self.trace_path)
 
 	def _parse_aliases(self) -> None:
 		if utils.settings.alias_settings is None:
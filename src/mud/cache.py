@@ -0,0 +1,174 @@
+import os
+import json
+import hashlib
+import threading
+
+from typing import Any, Dict, List, Set, Tuple
+
+CACHE_VERSION = 1
+
+
+# Persistent per-repository state stored as JSON next to .mudconfig. Every entry carries the
+# fingerprint it was computed for, stale entries are simply recomputed and overwritten.
+class Cache:
+	def __init__(self, file_path: str, enabled: bool = True):
+		self.file_path = file_path
+		self.enabled = enabled
+		self.hits = 0
+		self.misses = 0
+		self.data: Dict[str, Dict[str, Any]] = {}
+		self._changed = False
+		self._lock = threading.Lock()
+		self.load()
+
+	def load(self) -> None:
+		if not self.enabled or not os.path.exists(self.file_path):
+			return
+		try:
+			with open(self.file_path, 'r') as file:
+				data = json.load(file)
+		except (OSError, ValueError):
+			return
+		if isinstance(data, dict) and data.get('version') == CACHE_VERSION:
+			self.data = data.get('sections', {})
+
+	def save(self) -> None:
+		if not self.enabled or not self._changed:
+			return
+		temp_path = f'{self.file_path}.{os.getpid()}.tmp'
+		try:
+			with open(temp_path, 'w') as file:
+				json.dump({'version': CACHE_VERSION, 'sections': self.data}, file, separators=(',', ':'))
+			os.replace(temp_path, self.file_path)
+			self._changed = False
+		except OSError:
+			if os.path.exists(temp_path):
+				os.remove(temp_path)
+
+	def get(self, section: str, key: str, fingerprint: str) -> Any:
+		if not self.enabled:
+			return None
+		with self._lock:
+			entry = self.data.get(section, {}).get(key)
+			if entry is not None and entry[0] == fingerprint:
+				self.hits += 1
+				return entry[1]
+			self.misses += 1
+			return None
+
+	# Returns the stored [fingerprint, value] pair regardless of freshness, for incremental updates
+	def peek(self, section: str, key: str) -> List[Any] | None:
+		if not self.enabled:
+			return None
+		with self._lock:
+			return self.data.get(section, {}).get(key)
+
+	def set(self, section: str, key: str, fingerprint: str, value: Any) -> None:
+		if not self.enabled:
+			return
+		with self._lock:
+			self.data.setdefault(section, {})[key] = [fingerprint, value]
+			self._changed = True
+
+	# Drops entries of a section whose keys were not seen, so removed paths don't pile up
+	def retain(self, section: str, keys: Set[str]) -> None:
+		if not self.enabled:
+			return
+		with self._lock:
+			entries = self.data.get(section, {})
+			for key in [key for key in entries if key not in keys]:
+				del entries[key]
+				self._changed = True
+
+	# Least recently used memo for content addressed keys, which never go stale. Sections keep their
+	# insertion order in the JSON file, so the oldest entries come first. Hits move the entry to the
+	# end, the new order is written with the next save.
+	def recall(self, section: str, key: str) -> Any:
+		if not self.enabled:
+			return None
+		with self._lock:
+			entries = self.data.get(section, {})
+			value = entries.pop(key, None)
+			if value is None:
+				self.misses += 1
+				return None
+			entries[key] = value
+			self.hits += 1
+			return value
+
+	def remember(self, section: str, key: str, value: Any, limit: int) -> None:
+		if not self.enabled:
+			return
+		with self._lock:
+			entries = self.data.setdefault(section, {})
+			entries.pop(key, None)
+			entries[key] = value
+			for oldest in list(entries)[:max(0, len(entries) - limit)]:
+				del entries[oldest]
+			self._changed = True
+
+
+# Returns (git_dir, common_dir). They differ for linked worktrees, where .git is a file pointing
+# into the main repository.
+def get_git_dirs(path: str) -> Tuple[str, str]:
+	git_dir = os.path.join(path, '.git')
+	if os.path.isfile(git_dir):
+		with open(git_dir, 'r') as file:
+			line = file.readline().strip()
+		if line.startswith('gitdir:'):
+			git_dir = os.path.normpath(os.path.join(path, line.removeprefix('gitdir:').strip()))
+
+	common_dir = git_dir
+	common_file = os.path.join(git_dir, 'commondir')
+	if os.path.isfile(common_file):
+		with open(common_file, 'r') as file:
+			common_dir = os.path.normpath(os.path.join(git_dir, file.read().strip()))
+	return git_dir, common_dir
+
+
+# True for a .git directory and for a .git file whose gitdir: line points to one, like in linked
+# worktrees and submodule checkouts
+def has_git_dir(path: str) -> bool:
+	try:
+		return os.path.isdir(get_git_dirs(path)[0])
+	except (OSError, UnicodeDecodeError):
+		return False
+
+
+def stat(path: str) -> List[int] | None:
+	try:
+		result = os.stat(path)
+	except OSError:
+		return None
+	return [result.st_mtime_ns, result.st_size]
+
+
+def directory_mtimes(root: str, skip: str = '') -> List[Any]:
+	mtimes = []
+	stack = [root]
+	while stack:
+		directory = stack.pop()
+		mtimes.append(stat(directory))
+		try:
+			with os.scandir(directory) as entries:
+				for entry in entries:
+					if entry.is_dir(follow_symlinks=False) and entry.name != skip:
+						stack.append(entry.path)
+		except OSError:
+			continue
+	return mtimes
+
+
+# Cheap description of the repository metadata behind the HEAD, upstream and stash parts of status:
+# stats of the files git rewrites whenever HEAD, branch config, refs or stashes change. The worktree
+# is deliberately left out, telling that no tracked file was edited costs as much as git status.
+def fingerprint(path: str) -> str:
+	git_dir, common_dir = get_git_dirs(path)
+	parts = [
+		stat(os.path.join(git_dir, 'HEAD')),
+		stat(os.path.join(common_dir, 'config')),
+		stat(os.path.join(common_dir, 'packed-refs')),
+		stat(os.path.join(common_dir, 'logs', 'refs', 'stash')),
+		directory_mtimes(os.path.join(common_dir, 'refs')),
+	]
+	return hashlib.blake2b(json.dumps(parts).encode(), digest_size=16).hexdigest()
@@ -22,6 +22,7 @@ COMMANDS = ADD + REMOVE + PRUNE + LOG + INFO + INIT + TAGS + LABELS + STATUS + B
 # Filters
 ASYNC_ATTR = '-a', '--async'
 TABLE_ATTR = '-t', '--table'
+STREAM_ATTR = '-s', '--stream'
 MODIFIED_ATTR = '-m', '--modified'
 DIVERGED_ATTR = '-d', '--diverged'
 NAME_PREFIX = '-n=', '--name='
@@ -30,3 +31,12 @@ COMMAND_ATTR = '-c=', '--command='
 BRANCH_PREFIX = '-b=', '--branch='
 NOT_LABEL_PREFIX = '-L=', '--not-label='
 NOT_BRANCH_PREFIX = '-B=', '--not-branch='
+JOBS_PREFIX = '-j=', '--jobs='
+NO_CACHE_ATTR = '--no-cache',
+STATS_ATTR = '--stats',
+FORMAT_PREFIX = '--format=',
+TIMINGS_ATTR = '--timings',
+TRACE_PREFIX = '--trace=',
+TIMEOUT_PREFIX = '--timeout=',
+DEADLINE_PREFIX = '--deadline=',
+ORDER_PREFIX = '--order=',
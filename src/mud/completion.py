@@ -0,0 +1,175 @@
+import os
+import marshal
+
+from mud import roots
+from mud.settings import CONFIG_FILE_NAME, BRANCH_INDEX_FILE_NAME
+
+INDEX_VERSION = 1
+
+
+# Shell completion runs on every key press, so `mud complete-branch` and `mud complete-branch-all` are
+# served without pygit2, filters or tables, and without modules that are slow to import. Branch names
+# are read from ref files and kept in .mudcache-branches until HEAD, packed-refs or the ref
+# directories of a repository change.
+def run(include_remote: bool, prefix: str = '') -> None:
+	config_directory = find_config_directory()
+	if config_directory == '':
+		return
+
+	index = BranchIndex(os.path.join(config_directory, BRANCH_INDEX_FILE_NAME))
+	names: set[str] = set()
+	for path in read_repositories(os.path.join(config_directory, CONFIG_FILE_NAME)):
+		branches = index.get(os.path.join(config_directory, path))
+		if branches is None:
+			continue
+		current, local, remote = branches
+		if include_remote:
+			names.update(local.split('\n'))
+			names.update(remote.split('\n'))
+		elif current:
+			names.add(current)
+	names.discard('')
+	index.save()
+
+	for name in sorted((name for name in names if name.startswith(prefix)), key=str.casefold):
+		print(name)
+
+
+# Same lookup as Config.find. Settings are only read when no .mudconfig is found above the current directory.
+def find_config_directory() -> str:
+	return roots.find(_global_config_path)[0]
+
+
+def _global_config_path() -> str:
+	from mud.settings import Settings, SETTINGS_FILE_NAME, OLD_SETTINGS_FILE_NAME
+	return Settings(SETTINGS_FILE_NAME, OLD_SETTINGS_FILE_NAME).mud_settings['config_path']
+
+
+# Repository paths from .mudconfig, skipping the ones labelled `ignore`. Quoted rows are left to csv.
+def read_repositories(file_path: str) -> list[str]:
+	try:
+		with open(file_path, 'r') as file:
+			lines = file.read().splitlines()
+	except OSError:
+		return []
+
+	if any(line.startswith('"') for line in lines):
+		import csv
+		rows = list(csv.reader(lines, delimiter='\t'))
+	else:
+		rows = [line.split('\t') for line in lines]
+
+	return [
+		os.path.expanduser(row[0])
+		for row in rows
+		if row and row[0] and not (len(row) > 1 and 'ignore' in [label.strip() for label in row[1].split(',')])
+	]
+
+
+# (current, local, remote) branch names per repository, lists are joined by newlines. Stored with marshal
+# since it is read on every key press.
+class BranchIndex:
+	def __init__(self, file_path: str):
+		self.file_path = file_path
+		self.entries: dict[str, tuple] = {}
+		self._changed = False
+		try:
+			with open(file_path, 'rb') as file:
+				data = marshal.load(file)
+			if isinstance(data, dict) and data.get('version') == INDEX_VERSION:
+				self.entries = data['entries']
+		except (OSError, EOFError, ValueError, TypeError, KeyError):
+			pass
+
+	def save(self) -> None:
+		if not self._changed:
+			return
+		temp_path = f'{self.file_path}.{os.getpid()}.tmp'
+		try:
+			with open(temp_path, 'wb') as file:
+				marshal.dump({'version': INDEX_VERSION, 'entries': self.entries}, file)
+			os.replace(temp_path, self.file_path)
+		except OSError:
+			if os.path.exists(temp_path):
+				os.remove(temp_path)
+
+	# Entries are checked by stating the files and ref directories they were read from, a new or removed
+	# subdirectory changes the mtime of its parent so directories don't have to be listed again
+	def get(self, path: str) -> tuple | None:
+		entry = self.entries.get(path)
+		if entry is not None and all(_mtime(file_path) == mtime for file_path, mtime in entry[0]):
+			return entry[1]
+
+		git_dir = f'{path}/.git'
+		common_dir = git_dir
+		if os.path.isfile(git_dir):
+			from mud.cache import get_git_dirs
+			git_dir, common_dir = get_git_dirs(path)
+		elif not os.path.isdir(git_dir):
+			return None
+
+		watched = [f'{git_dir}/HEAD', f'{common_dir}/packed-refs']
+		watched += _ref_directories(f'{common_dir}/refs/heads') + _ref_directories(f'{common_dir}/refs/remotes')
+		sources = tuple((file_path, _mtime(file_path)) for file_path in watched)
+		branches = read_branches(git_dir, common_dir)
+		self.entries[path] = (sources, branches)
+		self._changed = True
+		return branches
+
+
+def read_branches(git_dir: str, common_dir: str) -> tuple:
+	refs: set[str] = set()
+	try:
+		with open(os.path.join(common_dir, 'packed-refs'), 'r') as file:
+			for line in file:
+				if line.startswith(('#', '^')):
+					continue
+				name = line.rstrip('\n').partition(' ')[2]
+				if name.startswith(('refs/heads/', 'refs/remotes/')):
+					refs.add(name)
+	except OSError:
+		pass
+
+	for directory in os.path.join(common_dir, 'refs', 'heads'), os.path.join(common_dir, 'refs', 'remotes'):
+		for root, _, files in os.walk(directory):
+			for file_name in files:
+				if not file_name.endswith('.lock'):
+					refs.add(os.path.relpath(os.path.join(root, file_name), common_dir).replace(os.sep, '/'))
+
+	current = ''
+	try:
+		with open(os.path.join(git_dir, 'HEAD'), 'r') as file:
+			head = file.read().strip()
+		if head.startswith('ref: refs/heads/') and head[5:] in refs:
+			current = head.removeprefix('ref: refs/heads/')
+	except OSError:
+		pass
+
+	remote = set()
+	for name in refs:
+		remote_branch = name.removeprefix('refs/remotes/')
+		if remote_branch != name and '/' in remote_branch:
+			remote.add(remote_branch.split('/', 1)[1])
+	remote.discard('HEAD')
+
+	local = sorted(name.removeprefix('refs/heads/') for name in refs if name.startswith('refs/heads/'))
+	return current, '\n'.join(local), '\n'.join(sorted(remote))
+
+
+def _mtime(path: str) -> int:
+	try:
+		return os.stat(path).st_mtime_ns
+	except OSError:
+		return 0
+
+
+# A ref directory and all of its subdirectories
+def _ref_directories(root: str) -> list[str]:
+	directories = [root]
+	for directory in directories:
+		try:
+			with os.scandir(directory) as entries:
+				directories.extend(entry.path for entry in entries if entry.is_dir(follow_symlinks=False))
+		except OSError:
+			continue
+	return directories
@@ -1,36 +1,30 @@
+from __future__ import annotations
+
 import os
 import re
 import csv
+import marshal
+
+from typing import Any, List, Dict, Tuple, TYPE_CHECKING
+
+from mud import utils, roots
+from mud.cache import has_git_dir
 
-from typing import List, Dict, Tuple
+if TYPE_CHECKING:
+	from mud.discovery import RepositoryFinder
 
-from mud import utils
+SNAPSHOT_VERSION = 1
 
 
 class Config:
 	def __init__(self):
 		self.data = {}
+		# Error code per repository path found by load_snapshot, 0 for valid repositories
+		self.errors: Dict[str, int] = {}
 
 	@staticmethod
 	def find() -> Tuple[str, bool]:
-		directory = os.getcwd()
-		current_path = directory
-		while os.path.dirname(current_path) != current_path:
-			if os.path.exists(os.path.join(current_path, utils.CONFIG_FILE_NAME)):
-				return current_path, False
-			current_path = os.path.dirname(current_path)
-
-		config_path = utils.settings.mud_settings['config_path']
-
-		if config_path.startswith('~'):
-			config_path = os.path.expanduser(config_path)
-
-		if config_path != '' and os.path.exists(config_path):
-			directory = os.path.dirname(config_path)
-			if os.path.exists(config_path):
-				return directory, True
-
-		return '', False
+		return roots.find(lambda: utils.settings.mud_settings['config_path'])
 
 	def save(self, file_path: str) -> None:
 		def _filter_labels(label: str):
@@ -48,6 +42,83 @@ class Config:
 
 	def load(self, file_path: str) -> None:
 		self.data = {}
+		for path, labels in self._read_rows(file_path):
+			if not os.path.exists(path):
+				utils.print_error(9, exit=False, meta=path)
+				continue
+			self.data[path] = labels
+
+	# Same as load, and also validates every repository. Parsed rows are kept in a snapshot next to
+	# .mudconfig until it changes. Repositories are validated per parent directory with a single
+	# scandir, which is skipped while the parent's mtime stays the same since creating or removing a
+	# repository directory changes it. Removing or replacing .git inside a repository doesn't change
+	# the parent, so .git is looked up for every repository on every load.
+	def load_snapshot(self, file_path: str, snapshot_path: str, use_snapshot: bool = True) -> None:
+		source = os.stat(file_path)
+		snapshot: Dict[str, Any] = {}
+		if use_snapshot:
+			try:
+				with open(snapshot_path, 'rb') as file:
+					snapshot = marshal.load(file)
+			except (OSError, EOFError, ValueError, TypeError):
+				pass
+		if not isinstance(snapshot, dict) or snapshot.get('version') != SNAPSHOT_VERSION:
+			snapshot = {}
+
+		changed = False
+		rows = snapshot.get('rows')
+		if snapshot.get('source') != (source.st_mtime_ns, source.st_size) or rows is None:
+			rows = self._read_rows(file_path)
+			changed = True
+
+		base_directory = os.path.dirname(os.path.abspath(file_path))
+		groups: Dict[str, List[str]] = {}
+		absolute_paths = {}
+		for path, _ in rows:
+			absolute_paths[path] = os.path.normpath(os.path.join(base_directory, path))
+			groups.setdefault(os.path.dirname(absolute_paths[path]), []).append(absolute_paths[path])
+
+		previous = snapshot.get('parents', {})
+		parents = {}
+		for parent, children in groups.items():
+			try:
+				mtime = os.stat(parent).st_mtime_ns
+			except OSError:
+				mtime = 0
+			entry = previous.get(parent)
+			if entry is None or entry[0] != mtime or any(child not in entry[1] for child in children):
+				entry = (mtime, self._validate(parent, children))
+				changed = True
+			else:
+				errors = self._validate_git_dirs(entry[1])
+				if errors != entry[1]:
+					entry = (mtime, errors)
+					changed = True
+			parents[parent] = entry
+
+		self.data = {}
+		self.errors = {}
+		for path, labels in rows:
+			absolute_path = absolute_paths[path]
+			error = parents[os.path.dirname(absolute_path)][1][absolute_path]
+			if error == 9:
+				utils.print_error(9, exit=False, meta=path)
+				continue
+			self.data[path] = labels
+			self.errors[path] = error
+
+		# Written in place, replacing the file would change the mtime of the directory it is in, which
+		# is usually one of the parents above. A torn write fails to load and is rebuilt.
+		if use_snapshot and changed:
+			try:
+				with open(snapshot_path, 'wb') as file:
+					marshal.dump({'version': SNAPSHOT_VERSION, 'source': (source.st_mtime_ns, source.st_size), 'rows': rows, 'parents': parents}, file)
+			except OSError:
+				pass
+
+	@staticmethod
+	def _read_rows(file_path: str) -> List[Tuple[str, List[str]]]:
+		rows = []
 		with open(file_path, 'r') as tsvfile:
 			reader = csv.reader(tsvfile, delimiter='\t')
 			for row in reader:
@@ -56,12 +127,47 @@ class Config:
 				if path.startswith('~'):
 					path = os.path.expanduser(path)
 
-				if not os.path.exists(path):
-					utils.print_error(9, exit=False, meta=path)
-					continue
-
 				labels = [label.strip() for label in row[1].split(',') if len(row) > 1 and label.strip()] if len(row) > 1 else []
-				self.data[path] = labels
+				rows.append((path, labels))
+		return rows
+
+	# Error codes for repositories sharing a parent directory: 9 when missing, 7 when not a directory,
+	# 8 without a .git directory or a .git file pointing to one
+	@staticmethod
+	def _validate(parent: str, children: List[str]) -> Dict[str, int]:
+		directories = set()
+		names = set()
+		try:
+			with os.scandir(parent) as entries:
+				for entry in entries:
+					names.add(entry.name)
+					if entry.is_dir():
+						directories.add(entry.name)
+		except OSError:
+			pass
+
+		errors = {}
+		for child in children:
+			name = os.path.basename(child)
+			if name not in names:
+				errors[child] = 9
+			elif name not in directories:
+				errors[child] = 7
+			elif not has_git_dir(child):
+				errors[child] = 8
+			else:
+				errors[child] = 0
+		return errors
+
+	# Checks .git again for directories validated by an earlier load
+	@staticmethod
+	def _validate_git_dirs(previous: Dict[str, int]) -> Dict[str, int]:
+		errors = {}
+		for child, error in previous.items():
+			if error in (0, 8):
+				error = 0 if has_git_dir(child) else 8
+			errors[child] = error
+		return errors
 
 	def filter_label(self, label: str, repos: Dict[str, List[str]] = None) -> Dict[str, List[str]]:
 		if repos is None:
@@ -74,20 +180,12 @@ class Config:
 				result[path] = labels
 		return result
 
-	def init(self):
+	def init(self, finder: RepositoryFinder) -> None:
 		if self.data is None:
 			self.data = {}
 
 		index = 0
-		git_repos = []
-
-		for root, dirs, files in os.walk('.', topdown=True):
-			if '.git' in dirs:
-				git_repos.append(os.path.relpath(root, '.'))
-				dirs.remove('.git')
-			dirs[:] = [d for d in dirs if not d.startswith('.')]
-
-		git_repos.sort()
+		git_repos = finder.find('.')
 
 		for repo in git_repos:
 			if repo in self.data.keys() or repo == '.' or repo == os.getcwd():
@@ -0,0 +1,93 @@
+import os
+import fnmatch
+
+from typing import Iterable, List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+
+from mud.cache import Cache
+from mud.settings import DEFAULT_JOBS
+
+
+# Finds repositories for `mud init`. Directories of one level are listed in parallel with os.scandir, and
+# a directory with a .git directory or file is a repository whose worktree is not searched any further
+# unless nested repositories are requested. Hidden directories and excluded names are skipped.
+# Every listing is stored in the cache by the directory's mtime, refresh reuses listings of directories
+# that didn't change since, creating or removing a repository changes the mtime of its parent.
+class RepositoryFinder:
+	def __init__(self, exclude: Iterable[str] = (), max_depth: int | None = None, nested: bool = False, cache: Cache | None = None, refresh: bool = False, jobs: int = 0):
+		self.exclude = [pattern for pattern in exclude if pattern]
+		self.max_depth = max_depth
+		self.nested = nested
+		self.cache = cache
+		self.refresh = refresh
+		self.executor = ThreadPoolExecutor(max_workers=jobs if jobs > 0 else DEFAULT_JOBS)
+		self._visited = set()
+
+	def close(self) -> None:
+		self.executor.shutdown()
+		if self.cache is not None:
+			self.cache.retain('discovery', self._visited)
+			self.cache.save()
+
+	# Returns repository paths relative to root, sorted
+	def find(self, root: str = '.') -> List[str]:
+		root = os.path.abspath(root)
+		repositories = []
+		frontier = [(root, 0)]
+		while frontier:
+			results = list(self.executor.map(lambda item: self._scan_directory(item[0]), frontier))
+			next_frontier = []
+			for (path, depth), (is_repository, names) in zip(frontier, results):
+				if is_repository and path != root:
+					repositories.append(os.path.relpath(path, root))
+					if not self.nested:
+						continue
+				if self.max_depth is not None and depth >= self.max_depth:
+					continue
+				next_frontier.extend((os.path.join(path, name), depth + 1) for name in names if not self._is_excluded(name))
+			frontier = next_frontier
+		return sorted(repositories)
+
+	def _is_excluded(self, name: str) -> bool:
+		return any(fnmatch.fnmatch(name, pattern) for pattern in self.exclude)
+
+	def _scan_directory(self, path: str) -> Tuple[bool, List[str]]:
+		fingerprint = ''
+		if self.cache is not None:
+			try:
+				fingerprint = str(os.stat(path).st_mtime_ns)
+			except OSError:
+				return False, []
+			self._visited.add(path)
+			if self.refresh:
+				cached = self.cache.get('discovery', path, fingerprint)
+				if cached is not None:
+					return cached[0], cached[1]
+
+		is_repository = False
+		names = []
+		try:
+			with os.scandir(path) as entries:
+				for entry in entries:
+					try:
+						if entry.name == '.git':
+							is_repository = entry.is_dir() or _is_git_file(entry.path)
+						elif not entry.name.startswith('.') and entry.is_dir(follow_symlinks=False):
+							names.append(entry.name)
+					except OSError:
+						continue
+		except OSError:
+			return False, []
+
+		if self.cache is not None:
+			self.cache.set('discovery', path, fingerprint, [is_repository, names])
+		return is_repository, names
+
+
+# Linked worktrees and submodules have a .git file pointing to the git directory
+def _is_git_file(path: str) -> bool:
+	try:
+		with open(path, 'r') as file:
+			return file.read(8) == 'gitdir: '
+	except (OSError, UnicodeDecodeError):
+		return False
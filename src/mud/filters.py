@@ -0,0 +1,40 @@
+import time
+
+from typing import Callable, Dict, List, Tuple
+
+from mud import timings
+
+# Stage costs, cheaper stages run first so expensive ones only see repositories that are still in
+CONFIG = 0
+FILESYSTEM = 1
+REFS = 2
+WORKTREE = 3
+
+
+# Ordered list of repository predicates. Each stage only receives the repositories that passed all
+# previous stages. Config and filesystem checks run inline, the others are spread over the inspection pool.
+class FilterPipeline:
+	def __init__(self, jobs: int = 0):
+		self.jobs = jobs
+		self.stages: List[Tuple[int, str, Callable[[str, List[str]], bool]]] = []
+		self.timings: Dict[str, Tuple[float, int, int]] = {}
+
+	def add(self, cost: int, name: str, predicate: Callable[[str, List[str]], bool]) -> None:
+		self.stages.append((cost, name, predicate))
+
+	def run(self, repos: Dict[str, List[str]]) -> Dict[str, List[str]]:
+		inspector = None
+		for cost, name, predicate in sorted(self.stages, key=lambda stage: stage[0]):
+			start = time.perf_counter()
+			count = len(repos)
+			with timings.span(f'filter {name}'):
+				if cost <= FILESYSTEM:
+					keep = [predicate(path, labels) for path, labels in repos.items()]
+				else:
+					if inspector is None:
+						from mud.inspector import Inspector
+						inspector = Inspector(self.jobs)
+					keep = inspector.map(lambda path: predicate(path, repos[path]), repos.keys())
+			repos = {path: labels for (path, labels), passed in zip(repos.items(), keep) if passed}
+			self.timings[name] = (time.perf_counter() - start, count, len(repos))
+		return repos
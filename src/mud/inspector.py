@@ -0,0 +1,429 @@
+import os
+import json
+import pygit2
+import subprocess
+
+from collections import Counter
+
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from pygit2 import Repository, Commit, Oid
+from pygit2.enums import FileStatus
+
+from mud import utils, timings
+from mud import cache as state_cache
+from mud.cache import Cache, get_git_dirs
+from mud.sizes import SizeScanner
+from mud.settings import DEFAULT_JOBS
+
+AHEAD_BEHIND_LIMIT = 4096
+
+# `git status --porcelain` codes of the index and worktree columns
+PORCELAIN_INDEX = {'M': FileStatus.INDEX_MODIFIED, 'T': FileStatus.INDEX_TYPECHANGE, 'A': FileStatus.INDEX_NEW, 'C': FileStatus.INDEX_NEW, 'D': FileStatus.INDEX_DELETED, 'R': FileStatus.INDEX_RENAMED}
+PORCELAIN_WORKTREE = {'M': FileStatus.WT_MODIFIED, 'T': FileStatus.WT_TYPECHANGE, 'A': FileStatus.WT_NEW, 'D': FileStatus.WT_DELETED, 'R': FileStatus.WT_RENAMED}
+
+# Repositories whose status was split across processes during this run, for --stats
+split_repositories: List[str] = []
+
+
+# Fans per-repository pygit2 work out over a bounded thread pool. libgit2 releases the GIL for most
+# of its calls, so repositories are inspected concurrently while results are kept in config order.
+# A repository that can't be opened, like one whose .git went away during the run, is reported and
+# gives None instead of failing the whole run.
+class Inspector:
+	def __init__(self, jobs: int = 0):
+		self.jobs = jobs if jobs > 0 else DEFAULT_JOBS
+
+	def map(self, function: Callable[[str], Any], paths: Iterable[str]) -> List[Any]:
+		function = timings.timed('inspect', _guarded(function))
+		paths = list(paths)
+		if self.jobs == 1 or len(paths) < 2:
+			return [function(path) for path in paths]
+
+		with ThreadPoolExecutor(max_workers=min(self.jobs, len(paths))) as executor:
+			return list(executor.map(function, paths))
+
+	# Same as map, but yields every result as soon as it is ready. In completion order by default,
+	# ordered keeps config order and yields each result once all results before it are ready.
+	# Repositories that couldn't be opened are left out.
+	def imap(self, function: Callable[[str], Any], paths: Iterable[str], ordered: bool = False) -> Iterator[Any]:
+		function = timings.timed('inspect', _guarded(function))
+		paths = list(paths)
+		if self.jobs == 1 or len(paths) < 2:
+			yield from (result for result in map(function, paths) if result is not None)
+			return
+
+		with ThreadPoolExecutor(max_workers=min(self.jobs, len(paths))) as executor:
+			futures = [executor.submit(function, path) for path in paths]
+			try:
+				for future in futures if ordered else as_completed(futures):
+					if future.result() is not None:
+						yield future.result()
+			finally:
+				for future in futures:
+					future.cancel()
+
+
+def _guarded(function: Callable[[str], Any]) -> Callable[[str], Any]:
+	def call(path: str) -> Any:
+		try:
+			return function(path)
+		except pygit2.GitError:
+			utils.print_error(8, meta=path)
+			return None
+
+	return call
+
+
+def get_head(repo: Repository, cache: Cache | None = None) -> Dict[str, str]:
+	if repo.head_is_unborn:
+		return {'kind': 'unborn', 'name': '', 'target': ''}
+
+	head_target = repo.head.target
+	if repo.head_is_detached:
+		tags = tag_index(repo, cache).get(str(head_target))
+		if tags:
+			return {'kind': 'tag', 'name': tags[0], 'target': str(head_target)}
+		return {'kind': 'commit', 'name': str(head_target)[-8:], 'target': str(head_target)}
+
+	return {'kind': 'branch', 'name': repo.head.shorthand, 'target': str(head_target)}
+
+
+# Maps peeled commit ids to the names of the tags pointing at them. Packed tags are read straight from
+# packed-refs, which already stores the peeled id of annotated tags, so only loose tags need object
+# lookups. The index is cached until packed-refs or the refs/tags directories change.
+def tag_index(repo: Repository, cache: Cache | None = None) -> Dict[str, List[str]]:
+	_, common_dir = get_git_dirs(repo.workdir.rstrip(os.sep))
+	tags_dir = os.path.join(common_dir, 'refs', 'tags')
+	fingerprint = ''
+	if cache is not None and cache.enabled:
+		fingerprint = json.dumps([state_cache.stat(os.path.join(common_dir, 'packed-refs')), state_cache.directory_mtimes(tags_dir)])
+		index = cache.get('tags', common_dir, fingerprint)
+		if index is not None:
+			return index
+
+	def peel(target: str) -> str:
+		obj = repo.get(target)
+		return str(obj.peel(None).id) if isinstance(obj, pygit2.Tag) else target
+
+	tags: Dict[str, str] = {}
+	packed_path = os.path.join(common_dir, 'packed-refs')
+	if os.path.isfile(packed_path):
+		peeled_traits = False
+		name = None
+		with open(packed_path, 'r') as file:
+			for line in file:
+				line = line.rstrip('\n')
+				if line.startswith('#'):
+					peeled_traits = ' peeled' in line
+				elif line.startswith('^'):
+					if name is not None:
+						tags[name] = line[1:]
+				else:
+					target, _, ref = line.partition(' ')
+					name = ref.removeprefix('refs/tags/') if ref.startswith('refs/tags/') else None
+					if name is not None:
+						tags[name] = target if peeled_traits else peel(target)
+
+	for root, _, files in os.walk(tags_dir):
+		for file_name in files:
+			name = os.path.relpath(os.path.join(root, file_name), tags_dir).replace(os.sep, '/')
+			try:
+				tags[name] = peel(str(repo.references[f'refs/tags/{name}'].resolve().target))
+			except (KeyError, ValueError, pygit2.GitError):
+				continue
+
+	index: Dict[str, List[str]] = {}
+	for name in sorted(tags):
+		index.setdefault(tags[name], []).append(name)
+	if cache is not None:
+		cache.set('tags', common_dir, fingerprint, index)
+	return index
+
+
+def get_origin_sync(repo: Repository, cache: Cache | None = None) -> Dict[str, Any]:
+	sync = {'upstream': None, 'ahead': 0, 'behind': 0}
+	if repo.head_is_unborn or repo.head_is_detached:
+		return sync
+
+	try:
+		local_ref = repo.branches[repo.head.shorthand]
+	except KeyError:
+		return sync
+
+	upstream = local_ref.upstream
+	if upstream:
+		sync['upstream'] = upstream.shorthand
+		sync['ahead'], sync['behind'] = ahead_behind(repo, local_ref.target, upstream.target, cache)
+	return sync
+
+
+# Walking the graph between two tips is expensive on long diverged branches. The result only depends
+# on the two commits, so it is memoized across runs.
+def ahead_behind(repo: Repository, local: Oid, upstream: Oid, cache: Cache | None = None) -> Tuple[int, int]:
+	key = f'{local}:{upstream}'
+	if cache is not None:
+		counts = cache.recall('ahead_behind', key)
+		if counts is not None:
+			return counts[0], counts[1]
+
+	counts = repo.ahead_behind(local, upstream)
+	if cache is not None:
+		cache.remember('ahead_behind', key, list(counts), AHEAD_BEHIND_LIMIT)
+	return counts
+
+
+# `mud status` data. HEAD, upstream sync and stash count are cached by the repository metadata, the
+# changed files are read on every call.
+def inspect_status(path: str, cache: Cache | None = None, split_files: int = 0) -> Dict[str, Any]:
+	repo_path = os.path.abspath(path)
+	with timings.span('open', path):
+		repo = Repository(repo_path)
+
+	fingerprint = ''
+	state = None
+	if cache is not None and cache.enabled:
+		fingerprint = state_cache.fingerprint(repo_path)
+		state = cache.get('status', repo_path, fingerprint)
+	if state is None:
+		with timings.span('head', path):
+			head = get_head(repo, cache)
+		with timings.span('ahead/behind', path):
+			sync = get_origin_sync(repo, cache)
+		with timings.span('stashes', path):
+			stashes = len(repo.listall_stashes())
+		state = {'head': head, 'sync': sync, 'stashes': stashes}
+		if cache is not None:
+			cache.set('status', repo_path, fingerprint, state)
+
+	with timings.span('status', path):
+		files = status_files(repo, repo_path, cache, split_files)
+	return {'path': path} | state | {'files': files}
+
+
+# Status flags of changed files. Repositories that had at least split_files tracked files last time are
+# split by top-level directory into `git status` processes running side by side, since libgit2 can't
+# spread the scan of a single worktree. Smaller ones stay in-process. File counts, overall and per
+# top-level directory to balance the processes, are remembered in the cache.
+def status_files(repo: Repository, repo_path: str, cache: Cache | None = None, split_files: int = 0, untracked: str = 'all') -> Dict[str, int]:
+	files = None
+	history = worktree_size(repo, repo_path, cache, split_files)
+	if history is not None and history['files'] >= split_files:
+		files = split_status(repo_path, history['directories'], untracked)
+	if files is None:
+		files = {file: int(flag) for file, flag in repo.status(untracked_files=untracked).items()}
+	return files
+
+
+# Returns the worktree size remembered from the previous run and records the current one. Counting
+# files per top-level directory walks the whole index, so it is only redone for large repositories
+# whose size changed by more than a quarter.
+def worktree_size(repo: Repository, repo_path: str, cache: Cache | None, split_files: int) -> Dict[str, Any] | None:
+	if cache is None or split_files <= 0:
+		return None
+
+	entry = cache.peek('worktree_size', repo_path)
+	history = entry[1] if entry is not None else None
+	files = len(repo.index)
+	directories = history['directories'] if history is not None else {}
+	if files >= split_files and (not directories or abs(files - history['files']) * 4 > files):
+		directories = Counter(item.path.split('/', 1)[0] for item in repo.index)
+	elif files < split_files:
+		directories = {}
+	if history is None or history['files'] != files or history['directories'] != directories:
+		cache.set('worktree_size', repo_path, '', {'files': files, 'directories': directories})
+	return history
+
+
+# Runs one `git status` per group of top-level entries, groups are balanced by their tracked file counts.
+# The last group takes everything not listed in the others, so new directories and files at the top
+# level are covered. Returns None when git fails, the caller falls back to libgit2.
+def split_status(repo_path: str, directories: Dict[str, int], untracked: str) -> Dict[str, int] | None:
+	groups = [[0, []] for _ in range(max(1, min(os.cpu_count() or 1, len(directories))))]
+	for name, count in sorted(directories.items(), key=lambda item: item[1], reverse=True):
+		group = min(groups, key=lambda item: item[0])
+		group[0] += count
+		group[1].append(name)
+
+	listed = [name for _, names in groups[:-1] for name in names]
+	pathspecs = [[f':(literal){name}' for name in names] for _, names in groups[:-1]]
+	pathspecs.append(['.'] + [f':(exclude,literal){name}' for name in listed])
+
+	# Optional locks would make the processes fight over index.lock to refresh the index
+	processes = [
+		subprocess.Popen(['git', '--no-optional-locks', 'status', '--porcelain=v1', '-z', '--no-renames', f'--untracked-files={untracked}', '--', *specs], cwd=repo_path, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+		for specs in pathspecs
+	]
+	files = {}
+	failed = False
+	for process in processes:
+		output, _ = process.communicate()
+		failed = failed or process.returncode != 0
+		files.update(parse_porcelain(output))
+	if failed:
+		return None
+	split_repositories.append(repo_path)
+	return files
+
+
+def parse_porcelain(output: bytes) -> Dict[str, int]:
+	files = {}
+	for line in output.split(b'\0'):
+		if len(line) < 4:
+			continue
+		code, file = line[:2].decode(), os.fsdecode(line[3:])
+		if code == '??':
+			files[file] = int(FileStatus.WT_NEW)
+		elif code == '!!':
+			files[file] = int(FileStatus.IGNORED)
+		elif 'U' in code or code in ('AA', 'DD'):
+			files[file] = int(FileStatus.CONFLICTED)
+		else:
+			files[file] = int(PORCELAIN_INDEX.get(code[0], 0) | PORCELAIN_WORKTREE.get(code[1], 0))
+	return files
+
+
+# Tells whether a repository has any change, stopping at the first difference: index against HEAD,
+# then tracked files against the index, then optionally untracked files without descending into
+# untracked directories. Every step is a git process that exits at the first change it finds, git
+# refreshes the index with parallel lstat calls and uses fsmonitor and the untracked cache when they
+# are configured. Not cached, the probe has to see in-place edits.
+def is_dirty(path: str, untracked: bool = True) -> bool:
+	repo_path = os.path.abspath(path)
+	if Repository(repo_path).head_is_unborn:
+		return True
+	return _git_differs(repo_path, 'diff', '--cached') or _git_differs(repo_path, 'diff') or (untracked and _git_has_untracked(repo_path))
+
+
+def _git_differs(path: str, *args: str) -> bool:
+	return subprocess.run(['git', *args, '--quiet'], cwd=path, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode == 1
+
+
+def _git_has_untracked(path: str) -> bool:
+	with subprocess.Popen(['git', 'ls-files', '--others', '--exclude-standard', '--directory', '--no-empty-directory'], cwd=path, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL) as process:
+		found = bool(process.stdout.read(1))
+		process.kill()
+	return found
+
+
+# `mud log` data
+def inspect_log(path: str, cache: Cache | None = None) -> Dict[str, Any]:
+	repo = Repository(path)
+	result = {'path': path, 'head': get_head(repo, cache), 'hash': '', 'author': '', 'by_user': False, 'time': None, 'offset': 0, 'message': ''}
+
+	if not repo.head_is_unborn:
+		commit: Commit = repo.revparse_single('HEAD')
+		result['hash'] = str(commit.id)
+		result['author'] = commit.author.name
+		result['by_user'] = commit.author.name == repo.config.__getitem__('user.name')
+		result['time'] = commit.commit_time
+		result['offset'] = commit.commit_time_offset
+		result['message'] = commit.message.splitlines()[0]
+
+	return result
+
+
+# `mud info` data
+def inspect_info(path: str, cache: Cache | None = None, scanner: SizeScanner | None = None) -> Dict[str, Any]:
+	repo = Repository(path)
+	origin_url = '' if repo.head_is_unborn or len(repo.remotes) == 0 else repo.remotes[0].url
+	user_name = repo.config['user.name'] if 'user.name' in repo.config else None
+	if repo.head_is_unborn:
+		total_commits_count, user_commits_count = None, None
+	else:
+		total_commits_count, user_commits_count = count_commits(repo, user_name, cache)
+
+	own_scanner = scanner is None
+	scanner = SizeScanner() if own_scanner else scanner
+	git_size = scanner.scan(get_git_dirs(os.path.abspath(path))[0])
+	worktree_size = scanner.scan(os.path.abspath(path), ['.git'])
+	if own_scanner:
+		scanner.close()
+
+	return {'path': path, 'url': origin_url, 'commits': total_commits_count, 'user_commits': user_commits_count, 'size': git_size + worktree_size, 'git_size': git_size, 'worktree_size': worktree_size}
+
+
+# Counts all commits and commits by user_name reachable from HEAD in a single unsorted walk. Counts are
+# cached by HEAD oid, when HEAD moves forward only the new commits are walked by hiding the old tip.
+def count_commits(repo: Repository, user_name: str | None, cache: Cache | None = None) -> Tuple[int, int | None]:
+	repo_path = os.path.abspath(repo.workdir or repo.path)
+	head = str(repo.head.target)
+	fingerprint = f'{head}:{user_name}'
+	previous = None
+
+	if cache is not None:
+		cached = cache.get('commits', repo_path, fingerprint)
+		if cached is not None:
+			return cached['total'], cached['user_total']
+		entry = cache.peek('commits', repo_path)
+		if entry is not None and entry[1]['user'] == user_name:
+			previous = entry[1]
+
+	walker = repo.walk(repo.head.target, pygit2.GIT_SORT_NONE)
+	total, user_total = 0, 0
+	if previous is not None and previous['head'] in repo and repo.descendant_of(head, previous['head']):
+		walker.hide(previous['head'])
+		total, user_total = previous['total'], previous['user_total'] or 0
+
+	for commit in walker:
+		total += 1
+		if user_name is not None and commit.author.name == user_name:
+			user_total += 1
+
+	user_total = None if user_name is None else user_total
+	if cache is not None:
+		cache.set('commits', repo_path, fingerprint, {'head': head, 'user': user_name, 'total': total, 'user_total': user_total})
+	return total, user_total
+
+
+# `mud tags` data
+def inspect_tags(path: str, cache: Cache | None = None) -> Dict[str, Any]:
+	repo = Repository(path)
+
+	if repo.head_is_unborn:
+		tags = []
+	else:
+		tags = sorted(name for names in tag_index(repo, cache).values() for name in names)
+
+	return {'path': path, 'tags': tags}
+
+
+# `mud branch` and `mud remote-branch` data
+def inspect_branches(path: str, remote: bool) -> Dict[str, Any]:
+	refs = index_references(path)
+	if not remote:
+		branches = refs['local']
+	elif len(refs['remotes']) == 1:
+		branches = next(iter(refs['remotes'].values()))
+	else:
+		branches = [f'{name}/{branch}' for name, remote_branches in refs['remotes'].items() for branch in remote_branches]
+	return {'path': path, 'current': refs['current'], 'branches': branches}
+
+
+# Groups all references of a repository into local branches, branches of every remote and tags while
+# enumerating them once. Remote HEAD symbolic references are left out.
+def index_references(path: str) -> Dict[str, Any]:
+	repo = Repository(path)
+	remote_names = sorted((remote.name for remote in repo.remotes), key=len, reverse=True)
+	refs = {
+		'path': path,
+		'current': '' if repo.head_is_unborn or repo.head_is_detached else repo.head.shorthand,
+		'local': [],
+		'remotes': {name: [] for name in sorted(remote_names)},
+		'tags': [],
+	}
+
+	for ref_name in repo.references:
+		if ref_name.startswith('refs/heads/'):
+			refs['local'].append(ref_name[11:])
+		elif ref_name.startswith('refs/tags/'):
+			refs['tags'].append(ref_name[10:])
+		elif ref_name.startswith('refs/remotes/'):
+			remote_branch = ref_name[13:]
+			# Remote names may contain slashes, so match against the configured ones first
+			name = next((name for name in remote_names if remote_branch.startswith(f'{name}/')), remote_branch.split('/', 1)[0])
+			branch = remote_branch[len(name) + 1:]
+			if branch and branch != 'HEAD':
+				refs['remotes'].setdefault(name, []).append(branch)
+	return refs
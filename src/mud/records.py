@@ -0,0 +1,56 @@
+import sys
+import json
+
+from typing import Any, Dict, Iterable, TextIO
+
+FORMATS = ['json', 'jsonl', 'tsv']
+STREAMED_FORMATS = ['jsonl']
+
+
+# Writes one record per repository for scripts and dashboards. json prints a single array, jsonl prints
+# every record as soon as it arrives, tsv prints a header named after the record keys followed by one
+# row per record.
+def write(records: Iterable[Dict[str, Any]], output_format: str, stream: TextIO = sys.stdout) -> None:
+	if output_format == 'json':
+		json.dump(list(records), stream, ensure_ascii=False)
+		stream.write('\n')
+	elif output_format == 'jsonl':
+		for record in records:
+			stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+			stream.flush()
+	elif output_format == 'tsv':
+		header = None
+		for record in records:
+			row = flatten(record)
+			if header is None:
+				header = list(row)
+				stream.write('\t'.join(header) + '\n')
+			stream.write('\t'.join(_escape(row.get(column, '')) for column in header) + '\n')
+
+
+# Nested records become dotted columns, lists are joined by commas, list items that are records by spaces
+def flatten(record: Dict[str, Any], prefix: str = '') -> Dict[str, Any]:
+	row = {}
+	for key, value in record.items():
+		if isinstance(value, dict):
+			row.update(flatten(value, f'{prefix}{key}.'))
+		elif isinstance(value, list):
+			row[f'{prefix}{key}'] = ','.join(_join(item) for item in value)
+		else:
+			row[f'{prefix}{key}'] = value
+	return row
+
+
+def _join(item: Any) -> str:
+	if isinstance(item, dict):
+		return ' '.join(str(value) for value in item.values())
+	return str(item)
+
+
+# Same escapes as the text format of PostgreSQL COPY, so tabs and newlines in messages keep rows intact
+def _escape(value: Any) -> str:
+	if value is None:
+		return ''
+	if isinstance(value, bool):
+		return 'true' if value else 'false'
+	return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
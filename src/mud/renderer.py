@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import sys
+import shutil
+
+from typing import Callable, List, TextIO, TYPE_CHECKING
+
+from mud import utils, timings
+from mud.styles import GRAY, RESET
+
+# Only LiveTable needs asyncio, streamed tables of native commands start without it
+if TYPE_CHECKING:
+	import asyncio
+
+# Seconds between two frames, updates arriving in between are merged into the next frame
+REFRESH_INTERVAL = 0.1
+
+CURSOR_UP = '\033[{}A'
+CLEAR_LINE = '\033[2K'
+
+
+# Redraws a block of lines at the bottom of the terminal. Updates only mark the block as stale, a frame
+# is rendered at most once per interval, only lines that differ from the previous frame are rewritten
+# and every frame goes out in a single write. When the output is not a terminal only the last frame
+# is printed.
+class LiveTable:
+	def __init__(self, render: Callable[[], List[str]], interval: float = REFRESH_INTERVAL, stream: TextIO = sys.stdout):
+		self.render = render
+		self.interval = interval
+		self.stream = stream
+		self.interactive = stream.isatty()
+		self.frames = 0
+		self.dropped = 0
+		self._lines: List[str] = []
+		self._stale = False
+		self._updates = 0
+		self._task: asyncio.Task | None = None
+
+	def start(self) -> None:
+		import asyncio
+
+		if self.interactive:
+			self._task = asyncio.create_task(self._loop())
+
+	async def stop(self) -> None:
+		import asyncio
+
+		if self._task is not None:
+			self._task.cancel()
+			try:
+				await self._task
+			except asyncio.CancelledError:
+				pass
+		self._draw()
+
+	def update(self) -> None:
+		self._stale = True
+		self._updates += 1
+
+	async def _loop(self) -> None:
+		import asyncio
+
+		while True:
+			await asyncio.sleep(self.interval)
+			if self._stale:
+				self._draw()
+
+	def _draw(self) -> None:
+		with timings.span('render'):
+			self._show(self.render())
+
+	def _show(self, lines: List[str]) -> None:
+		self.frames += 1
+		self.dropped += max(self._updates - 1, 0)
+		self._updates = 0
+		self._stale = False
+
+		if not self.interactive:
+			self.stream.write(''.join(f'{line}\n' for line in lines))
+			self.stream.flush()
+			return
+
+		previous = self._lines
+		first = next((index for index, line in enumerate(lines) if index >= len(previous) or previous[index] != line), len(lines))
+		if first == len(lines) and len(lines) == len(previous):
+			return
+
+		frame = [CURSOR_UP.format(len(previous) - first) + '\r' if first < len(previous) else '']
+		for index in range(first, max(len(lines), len(previous))):
+			if index >= len(lines):
+				frame.append(f'{CLEAR_LINE}\n')
+			elif index < len(previous) and previous[index] == lines[index]:
+				frame.append('\n')
+			else:
+				frame.append(f'{CLEAR_LINE}{lines[index]}\n')
+		if len(lines) < len(previous):
+			frame.append(CURSOR_UP.format(len(previous) - len(lines)))
+
+		self.stream.write(''.join(frame))
+		self.stream.flush()
+		self._lines = lines
+
+
+# Prints table rows one at a time as results arrive. Widths of rows that are not known yet can't be
+# measured, so columns start at the widths given up front, usually measured from paths and branch
+# names, and only grow. Rows line up unless a cell is wider than every cell before it. The last
+# column is not padded and lines are cut at the terminal width.
+class StreamedTable:
+	def __init__(self, columns: List[str], widths: List[int], header: bool = True, borders: bool = False, stream: TextIO = sys.stdout):
+		self.columns = columns
+		self.widths = [max(width, utils.visible_length(column) if header else 0) for column, width in zip(columns, widths)]
+		self.header = header
+		self.separator = f' {GRAY}│{RESET} ' if borders else '  '
+		self.stream = stream
+		self.rows = 0
+
+	def print_header(self) -> None:
+		if self.header:
+			self._write(self.columns)
+
+	def print_row(self, cells: List[str]) -> None:
+		self.rows += 1
+		self._write(cells)
+
+	def _write(self, cells: List[str]) -> None:
+		padded = []
+		for index, cell in enumerate(cells):
+			length = utils.visible_length(cell)
+			self.widths[index] = max(self.widths[index], length)
+			padded.append(cell if index == len(cells) - 1 else cell + ' ' * (self.widths[index] - length))
+		width, _ = shutil.get_terminal_size()
+		self.stream.write(utils.truncate(self.separator.join(padded).rstrip(), width) + '\n')
+		self.stream.flush()
@@ -0,0 +1,33 @@
+import os
+
+from mud.settings import CONFIG_FILE_NAME
+
+CONFIG_ENVIRONMENT_VARIABLE = 'MUD_CONFIG'
+
+
+# Resolves the directory of .mudconfig for the current directory, and whether it came from the global
+# config_path. MUD_CONFIG takes precedence over both. Otherwise the current directory and its parents
+# are searched, global_config_path is only called when that walk finds nothing.
+def find(global_config_path) -> tuple[str, bool]:
+	config_path = os.environ.get(CONFIG_ENVIRONMENT_VARIABLE, '')
+	if config_path != '':
+		config_path = os.path.abspath(os.path.expanduser(config_path))
+		if os.path.isdir(config_path):
+			config_path = os.path.join(config_path, CONFIG_FILE_NAME)
+		if os.path.exists(config_path):
+			return os.path.dirname(config_path), False
+		return '', False
+
+	return _walk(os.getcwd(), global_config_path)
+
+
+def _walk(current_path: str, global_config_path) -> tuple[str, bool]:
+	while os.path.dirname(current_path) != current_path:
+		if os.path.exists(os.path.join(current_path, CONFIG_FILE_NAME)):
+			return current_path, False
+		current_path = os.path.dirname(current_path)
+
+	config_path = os.path.expanduser(global_config_path())
+	if config_path != '' and os.path.exists(config_path):
+		return os.path.dirname(config_path), True
+	return '', False
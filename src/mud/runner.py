@@ -1,18 +1,38 @@
-import asyncio
+from __future__ import annotations
+
+import sys
+import time
+import shutil
+import signal
 import subprocess
-import pygit2
 
-from typing import Dict, Iterable, List
-from asyncio import Semaphore
+from typing import Any, AsyncIterator, Awaitable, BinaryIO, Callable, Dict, Iterable, List, Tuple, TYPE_CHECKING
 from datetime import datetime, timezone, timedelta
+from functools import lru_cache
 from collections import Counter
 
-from pygit2 import Repository, Commit
-from pygit2.enums import FileStatus
-
-from mud import utils
+from mud import utils, timings
 from mud.utils import *
 from mud.styles import *
+from mud.cache import Cache
+
+# pygit2, asyncio and the table renderer are slow to import, they are loaded by the commands using them
+if TYPE_CHECKING:
+	import asyncio
+
+	from mud.renderer import LiveTable
+	from mud.scheduler import Scheduler
+	from mud.sizes import SizeScanner
+
+
+# Longest line kept in memory while streaming, longer lines are emitted in pieces
+LINE_LIMIT = 64 * 1024
+# Output of a repository is kept in memory up to this size in grouped mode, then spilled to disk
+SPOOL_LIMIT = 1024 * 1024
+# Formatted paths kept in memory, enough for the repositories of a large fleet
+FORMAT_CACHE_SIZE = 4096
+# Seconds a timed out or interrupted command gets between SIGTERM and SIGKILL
+KILL_GRACE = 2.0
 
 
 class Runner:
@@ -22,19 +42,29 @@ class Runner:
 
 	def __init__(self, repos):
 		self._force_color_env = self._force_color_env | os.environ.copy()
-		self._printed_lines_count = 0
+		self.renderer: LiveTable | None = None
 		self.repos = repos
+		self.jobs = 0
+		self.cache = None
+		self.format = ''
+		self.stream = False
+		self.order = 'config'
+		self.split_files = 0
+		self.timeout = 0.0
+		self.deadline = 0.0
+		self._deadline_at: float | None = None
 
 	# `mud info` command implementation
 	def info(self, repos: Dict[str, List[str]]) -> None:
-		def get_directory_size(directory: str) -> int:
-			total_size = 0
-			for directory_path, directory_names, file_names in os.walk(directory):
-				for f in file_names:
-					fp: str = str(os.path.join(directory_path, f))
-					if os.path.isfile(fp):
-						total_size += os.path.getsize(fp)
-			return total_size
+		from mud import inspector
+
+		if self.format:
+			scanner = self._get_size_scanner()
+			try:
+				self._print_records(repos, lambda path: inspector.inspect_info(path, self.cache, scanner))
+			finally:
+				scanner.close()
+			return
 
 		def format_size(size_in_bytes: int) -> str:
 			if size_in_bytes >= 1024 ** 3:
@@ -60,63 +90,73 @@ class Runner:
 			else:
 				return YELLOW + glyphs('git') + RESET
 
-		table: PrettyTable = utils.get_table([
+		columns = [
 			f'{YELLOW}{glyphs('git-repo')}{glyphs('space')}{RESET}Directory',
 			f'{BRIGHT_RED}{glyphs('git')}{glyphs('space')}{RESET}Url',
 			f'{BLUE}{glyphs('commit')}{glyphs('space')}{RESET}Commits',
 			f'{BLUE}{glyphs('commit')}{glyphs('space')}{RESET}User Commits',
 			f'{MAGENTA}{glyphs('weight')}{glyphs('space')}{RESET}Size',
-			f'{MAGENTA}{glyphs('labels')}{glyphs('space')}{RESET}Labels'])
-		table.align[f'{BLUE}{glyphs('commit')}{glyphs('space')}{RESET}Commits'] = 'r'
-		table.align[f'{BLUE}{glyphs('commit')}{glyphs('space')}{RESET}User Commits'] = 'r'
-		table.align[f'{MAGENTA}{glyphs('weight')}{glyphs('space')}{RESET}Size'] = 'r'
-
-		for path, labels in repos.items():
-			repo = Repository(path)
-			origin_url = '' if repo.head_is_unborn or len(repo.remotes) == 0 else repo.remotes[0].url
-			if repo.head_is_unborn:
-				total_commits_count = None
-			else:
-				walker = repo.walk(repo.head.target, pygit2.GIT_SORT_TOPOLOGICAL)
-				total_commits_count = sum(1 for _ in walker)
-
-			user_name = repo.config['user.name']
-			if repo.head_is_unborn or user_name is None:
-				user_commits_count = None
-			else:
-				walker = repo.walk(repo.head.target, pygit2.GIT_SORT_TOPOLOGICAL)
-				user_commits_count = sum(1 for c in walker if c.author.name == user_name)
+			f'{MAGENTA}{glyphs('weight')}{glyphs('space')}{RESET}.git',
+			f'{MAGENTA}{glyphs('labels')}{glyphs('space')}{RESET}Labels']
 
+		def row(result: Dict[str, Any]) -> List[str]:
+			path, origin_url = result['path'], result['url']
+			total_commits_count, user_commits_count = result['commits'], result['user_commits']
 			formatted_path = link(self._get_formatted_path(path), os.path.abspath(path))
 			url = f'{get_git_origin_host_icon(origin_url)}{glyphs('space')}{link(origin_url.split('://', 1)[-1].split("/", 1)[0], origin_url)}'
-			size = format_size(get_directory_size(path))
+			size = format_size(result['size'])
+			git_size = format_size(result['git_size'])
 			total_commits = '' if total_commits_count is None else f'{BOLD}{total_commits_count}{RESET} {DIM}commits{RESET}'
 			user_commits = '' if user_commits_count is None else f'{GREEN}{BOLD}{user_commits_count}{RESET} {DIM}by you{RESET}'
-			colored_labels = self._get_formatted_labels(labels)
-
-			table.add_row([formatted_path, url, total_commits, user_commits, size, colored_labels])
+			colored_labels = self._get_formatted_labels(repos[path])
+			return [formatted_path, url, total_commits, user_commits, size, git_size, colored_labels]
+
+		scanner = self._get_size_scanner()
+		try:
+			if self.stream:
+				self._print_streamed(repos, lambda path: inspector.inspect_info(path, self.cache, scanner), row, columns, [self._get_path_width(repos)])
+				return
+			results = self._inspect(lambda path: inspector.inspect_info(path, self.cache, scanner), repos.keys())
+		finally:
+			scanner.close()
+
+		table: PrettyTable = utils.get_table(columns)
+		for column in columns[2:6]:
+			table.align[column] = 'r'
+		for result in results:
+			table.add_row(row(result))
 
 		utils.print_table(table)
 
 	# `mud status` command implementation
 	def status(self, repos: Dict[str, List[str]]) -> None:
-		table = utils.get_table([
+		from mud import inspector
+		from pygit2.enums import FileStatus
+
+		if self.format:
+			def record(result: Dict[str, Any]) -> Dict[str, Any]:
+				files = [{'path': file, 'status': FileStatus(flag).name} for file, flag in result['files'].items()]
+				return result | {'files': files}
+
+			self._print_records(repos, lambda path: inspector.inspect_status(path, self.cache, self.split_files), record)
+			return
+
+		columns = [
 			f'{YELLOW}{glyphs('git-repo')}{glyphs('space')}{RESET}Directory',
 			f'{GREEN}{glyphs('branch')}{glyphs('space')}{RESET}Branch',
 			f'{CYAN}{glyphs('origin-sync')}{glyphs('space')}{RESET}Origin Sync',
 			f'{RED}{glyphs('stash')}{glyphs('space')}{RESET}Stash',
 			f'{BRIGHT_YELLOW}{glyphs('info')}{glyphs('space')}{RESET}Status',
-			f'{BRIGHT_GREEN}{glyphs('git-modified')}{glyphs('space')}{RESET}Modified Files'])
+			f'{BRIGHT_GREEN}{glyphs('git-modified')}{glyphs('space')}{RESET}Modified Files']
 
-		for path, labels in repos.items():
+		def row(result: Dict[str, Any]) -> List[str]:
+			path = result['path']
 			repo_path = os.path.abspath(path)
-			repo = Repository(repo_path)
-			status = repo.status()
-			modified = status.items()
-			formatted_path = link(self._get_formatted_path(path), os.path.abspath(path))
-			head_info = self._get_head_info(repo)
-			origin_sync = self._get_origin_sync(repo)
-			stash_count = self._stash_count(repo)
+			modified = result['files'].items()
+			formatted_path = link(self._get_formatted_path(path), repo_path)
+			head_info = self._get_head_info(result['head'])
+			origin_sync = self._get_origin_sync(result['head'], result['sync'])
+			stash_count = self._stash_count(result['stashes'])
 			mini_status = self._get_status_string(modified)
 			colored_output = []
 
@@ -132,12 +172,27 @@ class Runner:
 				else:
 					color = CYAN
 				colored_output.append(link(self._get_formatted_path(file, False, color), os.path.join(repo_path, file)))
-			table.add_row([formatted_path, head_info, origin_sync, stash_count, mini_status, ', '.join(colored_output)])
+			return [formatted_path, head_info, origin_sync, stash_count, mini_status, ', '.join(colored_output)]
+
+		inspect = lambda path: inspector.inspect_status(path, self.cache, self.split_files)
+		if self.stream:
+			self._print_streamed(repos, inspect, row, columns, [self._get_path_width(repos), self._get_head_width(repos)])
+			return
+
+		table = utils.get_table(columns)
+		for result in self._inspect(inspect, repos.keys()):
+			table.add_row(row(result))
 
 		utils.print_table(table)
 
 	# `mud labels` command implementation
 	def labels(self, repos: Dict[str, List[str]]) -> None:
+		if self.format:
+			from mud import records
+
+			records.write(({'path': path, 'labels': labels} for path, labels in repos.items()), self.format)
+			return
+
 		table = utils.get_table([
 			f'{YELLOW}{glyphs('git-repo')}{glyphs('space')}{RESET}Directory',
 			f'{MAGENTA}{glyphs('labels')}{glyphs('space')}{RESET}Labels'])
@@ -151,55 +206,68 @@ class Runner:
 
 	# `mud log` command implementation
 	def log(self, repos: Dict[str, List[str]]) -> None:
-		table = utils.get_table([
+		from mud import inspector
+
+		if self.format:
+			self._print_records(repos, lambda path: inspector.inspect_log(path, self.cache))
+			return
+
+		columns = [
 			f'{YELLOW}{glyphs('git-repo')}{glyphs('space')}{RESET}Directory',
 			f'{GREEN}{glyphs('branch')}{glyphs('space')}{RESET}Branch',
 			f'{BRIGHT_YELLOW}{glyphs('hash')}{glyphs('space')}{RESET}Hash',
 			f'{BRIGHT_GREEN}{glyphs('author')}{glyphs('space')}{RESET}Author',
 			f'{BRIGHT_CYAN}{glyphs('time')}{glyphs('space')}{RESET}Time',
-			f'{BRIGHT_BLUE}{glyphs('message')}{glyphs('space')}{RESET}Message'])
+			f'{BRIGHT_BLUE}{glyphs('message')}{glyphs('space')}{RESET}Message']
 
-		for path in repos.keys():
-			repo = Repository(path)
+		def row(result: Dict[str, Any]) -> List[str]:
+			path = result['path']
 
-			if repo.head_is_unborn:
+			if result['time'] is None:
 				author, commit_hash, time, message = '', '', '', ''
 			else:
-				commit: Commit = repo.revparse_single('HEAD')
-				author = f'{BOLD if commit.author.name == repo.config.__getitem__('user.name') else DIM}{commit.author.name}{RESET}'
-				commit_hash = f'{YELLOW}{str(commit.id)[-8:]}{RESET}'
-				time = datetime.fromtimestamp(commit.commit_time, timezone(timedelta(minutes=commit.commit_time_offset))).strftime('%Y-%m-%d %H:%M:%S')
-				message = commit.message.splitlines()[0]
+				author = f'{BOLD if result['by_user'] else DIM}{result['author']}{RESET}'
+				commit_hash = f'{YELLOW}{result['hash'][-8:]}{RESET}'
+				time = datetime.fromtimestamp(result['time'], timezone(timedelta(minutes=result['offset']))).strftime('%Y-%m-%d %H:%M:%S')
+				message = result['message']
 
 			formatted_path = link(self._get_formatted_path(path), os.path.abspath(path))
-			head_info = self._get_head_info(repo)
+			head_info = self._get_head_info(result['head'])
+			return [formatted_path, head_info, commit_hash, author, time, message]
+
+		inspect = lambda path: inspector.inspect_log(path, self.cache)
+		if self.stream:
+			# Hashes are cut to 8 characters and times have a fixed format
+			self._print_streamed(repos, inspect, row, columns, [self._get_path_width(repos), self._get_head_width(repos), 8, 0, 19])
+			return
 
-			table.add_row([formatted_path, head_info, commit_hash, author, time, message])
+		table = utils.get_table(columns)
+		for result in self._inspect(inspect, repos.keys()):
+			table.add_row(row(result))
 
 		utils.print_table(table)
 
 	# `mud branch` command implementation
 	def branches(self, paths: Dict[str, List[str]], remote: bool) -> None:
+		from mud import inspector
+
+		if self.format:
+			self._print_records(paths, lambda path: inspector.inspect_branches(path, remote))
+			return
+
 		table = utils.get_table([
 			f'{YELLOW}{glyphs('git-repo')}{glyphs('space')}{RESET}Directory',
 			f'{BLUE}{glyphs('branch')}{glyphs('space')}{RESET}Branches'])
-		all_branches = {}
-		repos = [[path, Repository(path)] for path in paths]
-		prefix = 'refs/remotes/' if remote else 'refs/heads/'
-
-		# Preparing branches for sorting to display them in the right order.
-		for path, repo in repos:
-			for branch in [ref.replace(prefix + (repo.remotes[0].name + '/' if remote else ''), '') for ref in repo.references if ref.startswith(prefix + (repo.remotes[0].name + '/' if remote else ''))]:
-				if branch not in all_branches:
-					all_branches[branch] = 0
-				all_branches[branch] += 1
-		branch_counter = Counter(all_branches)
-
-		for path, repo in repos:
+
+		results = self._inspect(lambda path: inspector.inspect_branches(path, remote), paths.keys())
+
+		# Branches shared by more repositories are listed first
+		branch_counter = Counter(branch for result in results for branch in result['branches'])
+
+		for result in results:
+			path, current_branch = result['path'], result['current']
 			formatted_path = link(self._get_formatted_path(path), os.path.abspath(path))
-			branches = [ref.replace(prefix + (repo.remotes[0].name + '/' if remote else ''), '') for ref in repo.references if ref.startswith(prefix + (repo.remotes[0].name + '/' if remote else ''))]
-			current_branch = '' if repo.head_is_unborn or repo.head_is_detached else repo.head.shorthand
-			sorted_branches = sorted(branches, key=lambda x: branch_counter.get(x, 0), reverse=True)
+			sorted_branches = sorted(result['branches'], key=lambda x: branch_counter.get(x, 0), reverse=True)
 
 			if current_branch and current_branch in sorted_branches:
 				sorted_branches.remove(current_branch)
@@ -211,12 +279,19 @@ class Runner:
 		utils.print_table(table)
 
 	# `mud complete-branch` and `mud complete-branch-all` command implementation
-	def complete_branches(self, paths: Dict[str, List[str]], include_remote: bool) -> None:
+	def complete_branches(self, paths: Dict[str, List[str]], include_remote: bool, prefix: str = '') -> None:
 		for branch in self._get_unique_branch_names(paths.keys(), include_remote):
-			print(branch)
+			if branch.startswith(prefix):
+				print(branch)
 
 	# `mud tags` command implementation
 	def tags(self, repos: Dict[str, List[str]]) -> None:
+		from mud import inspector
+
+		if self.format:
+			self._print_records(repos, lambda path: inspector.inspect_tags(path, self.cache))
+			return
+
 		COLORS = [196, 202, 208, 214, 220, 226, 118, 154, 190, 33, 39, 45, 51, 87, 93, 99, 105, 111, 27, 63, 69, 75, 81, 87, 123, 129, 135, 141, 147, 183, 189, 225]
 		tag_colors = {}
 
@@ -226,115 +301,339 @@ class Runner:
 				tag_colors[tag] = f'\033[38;5;{color_code}m'
 			return tag_colors[tag]
 
-		table = utils.get_table([
+		columns = [
 			f'{YELLOW}{glyphs('git-repo')}{glyphs('space')}{RESET}Directory',
-			f'{BRIGHT_BLUE}{glyphs('tags')}{glyphs('space')}{RESET}Tags'])
-
-		for path, labels in repos.items():
-			repo = Repository(path)
-
-			if repo.head_is_unborn:
-				tags = []
-			else:
-				tags = [
-					ref.replace('refs/tags/', '', 1)
-					for ref in repo.references
-					if ref.startswith('refs/tags/')
-				]
-				tags.sort()
+			f'{BRIGHT_BLUE}{glyphs('tags')}{glyphs('space')}{RESET}Tags']
 
+		def row(result: Dict[str, Any]) -> List[str]:
+			path, tags = result['path'], result['tags']
 			formatted_path = link(self._get_formatted_path(path), os.path.abspath(path))
 
 			tags = [f'{assign_color(tag)}{glyphs('tag')} {RESET}{tag}' for tag in tags]
-			table.add_row([formatted_path, ' '.join(tags)])
+			return [formatted_path, ' '.join(tags)]
+
+		inspect = lambda path: inspector.inspect_tags(path, self.cache)
+		if self.stream:
+			self._print_streamed(repos, inspect, row, columns, [self._get_path_width(repos)])
+			return
+
+		table = utils.get_table(columns)
+		for result in self._inspect(inspect, repos.keys()):
+			table.add_row(row(result))
 
 		utils.print_table(table)
 
+	# --format output. Records are the inspection results with the labels of each repository, written
+	# without styling or tables. Streamed formats get every record as soon as its repository is inspected.
+	def _print_records(self, repos: Dict[str, List[str]], inspect: Callable[[str], Dict[str, Any]], record: Callable[[Dict[str, Any]], Dict[str, Any]] | None = None) -> None:
+		from mud import records
+		from mud.inspector import Inspector
+
+		if self.format in records.STREAMED_FORMATS:
+			results = Inspector(self.jobs).imap(inspect, repos.keys())
+		else:
+			results = self._inspect(inspect, repos.keys())
+		records.write(({'path': result['path'], 'labels': repos[result['path']]} | (record(result) if record else result) for result in results), self.format)
+
+	# Inspection results in config order, without repositories that couldn't be opened
+	def _inspect(self, inspect: Callable[[str], Dict[str, Any]], paths: Iterable[str]) -> List[Dict[str, Any]]:
+		from mud.inspector import Inspector
+		return [result for result in Inspector(self.jobs).map(inspect, paths) if result is not None]
+
+	# Table rows printed as soon as each repository is inspected, in config or completion order. Widths
+	# start from what is known before inspecting, the rest of the columns grow with the rows.
+	def _print_streamed(self, repos: Dict[str, List[str]], inspect: Callable[[str], Dict[str, Any]], row: Callable[[Dict[str, Any]], List[str]], columns: List[str], widths: List[int]) -> None:
+		from mud.inspector import Inspector
+		from mud.renderer import StreamedTable
+
+		table = StreamedTable(columns, widths + [0] * (len(columns) - len(widths)), utils.profile.display_header, utils.profile.display_borders)
+		table.print_header()
+		for result in Inspector(self.jobs).imap(inspect, repos.keys(), self.order == 'config'):
+			table.print_row(row(result))
+
+	def _get_path_width(self, repos: Dict[str, List[str]]) -> int:
+		return max((utils.visible_length(self._get_formatted_path(path)) for path in repos), default=0)
+
+	# Width of the branch column read from HEAD files, without opening repositories
+	def _get_head_width(self, repos: Dict[str, List[str]]) -> int:
+		from mud.cache import get_git_dirs
+
+		width = 0
+		for path in repos:
+			try:
+				with open(os.path.join(get_git_dirs(os.path.abspath(path))[0], 'HEAD'), 'r') as file:
+					head = file.read().strip()
+			except OSError:
+				continue
+			if head.startswith('ref: refs/heads/'):
+				head_info = self._get_head_info({'kind': 'branch', 'name': head.removeprefix('ref: refs/heads/')})
+			else:
+				head_info = self._get_head_info({'kind': 'commit', 'name': head[-8:]})
+			width = max(width, utils.visible_length(head_info))
+		return width
+
+	def _get_size_scanner(self) -> SizeScanner:
+		from mud.sizes import SizeScanner
+
+		size_cache = None
+		if self.cache is not None:
+			size_cache = Cache(os.path.join(os.path.dirname(self.cache.file_path), utils.SIZE_CACHE_FILE_NAME), self.cache.enabled)
+		return SizeScanner(utils.settings.mud_settings['size_exclude'].split(','), size_cache, self.jobs)
+
 	# `mud <COMMAND>` when run_async = 0 and run_table = 0
 	def run_ordered(self, repos: List[str], command: str) -> None:
+		self._start_deadline()
 		for path in repos:
-			process = subprocess.run(command, cwd=path, universal_newlines=True, shell=True, capture_output=True, text=True, env=self._force_color_env)
-			self._print_process_header(path, command, process.returncode != 0, process.returncode)
-			if process.stdout and not process.stdout.isspace():
-				print(process.stdout)
-			if process.stderr and not process.stderr.isspace():
-				print(process.stderr)
+			if self._expired():
+				self._print_process_header(path, command, True, 0, True)
+				continue
+			timed_out = False
+			with timings.span('process', path, path):
+				process = subprocess.Popen(command, cwd=path, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, env=self._force_color_env, start_new_session=True)
+				try:
+					stdout, stderr = process.communicate(timeout=self._time_limit())
+				except subprocess.TimeoutExpired:
+					timed_out = True
+					stdout, stderr = self._terminate(process)
+				except KeyboardInterrupt:
+					self._terminate(process)
+					raise
+			self._print_process_header(path, command, process.returncode != 0, process.returncode, timed_out)
+			if stdout and not stdout.isspace():
+				print(stdout)
+			if stderr and not stderr.isspace():
+				print(stderr)
 
 	# `mud <COMMAND>` when run_async = 1 and run_table = 0
 	async def run_async(self, repos: List[str], command: str) -> None:
-		sem: Semaphore = Semaphore(len(repos))
+		import tempfile
 
 		async def run_process(path: str) -> None:
-			async with sem:
-				process = await asyncio.create_subprocess_shell(command, cwd=path, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=self._force_color_env)
-				stdout, stderr = await process.communicate()
-				self._print_process_header(path, command, process.returncode != 0, process.returncode)
-				if stderr:
-					print(stderr.decode())
-				if stdout and not stdout.isspace():
-					print(stdout.decode())
+			if self._expired():
+				self._print_process_header(path, command, True, 0, True)
+				return
+			with tempfile.SpooledTemporaryFile(SPOOL_LIMIT) as stdout, tempfile.SpooledTemporaryFile(SPOOL_LIMIT) as stderr:
+				with timings.span('process', path, path):
+					process = await self._start_process(path, command)
+					results = await self._communicate(process, self._spool(process.stderr, stderr), self._spool(process.stdout, stdout))
+				# Output of a timed out command is printed up to where it was stopped
+				printable = results[1] if results is not None else stdout.tell() > 0
+				# Nothing is awaited from here on, so blocks of different repositories never interleave
+				self._print_process_header(path, command, process.returncode != 0, process.returncode, results is None)
+				if stderr.tell():
+					self._print_spool(stderr)
+				if printable:
+					self._print_spool(stdout)
+
+		self._start_deadline()
+		await self._get_scheduler().run(repos, run_process)
+
+	# `mud <COMMAND>` when run_async = 1, run_table = 0 and run_stream = 1
+	async def run_async_streamed(self, repos: List[str], command: str) -> None:
+		import asyncio
+
+		repos = list(repos)
+		prefixes = {path: f'{link(self._get_formatted_path(path), os.path.abspath(path))}' for path in repos}
+		width = max((utils.visible_length(prefix) for prefix in prefixes.values()), default=0)
+
+		async def print_lines(stream: asyncio.StreamReader, prefix: str) -> None:
+			async for line in self._read_lines(stream):
+				sys.stdout.write(f'{prefix} {GRAY}│{RESET} {line}\n')
+				sys.stdout.flush()
+
+		async def run_process(path: str) -> None:
+			if self._expired():
+				self._print_process_header(path, command, True, 0, True)
+				return
+			prefix = prefixes[path] + ' ' * (width - utils.visible_length(prefixes[path]))
+			with timings.span('process', path, path):
+				process = await self._start_process(path, command)
+				results = await self._communicate(process, print_lines(process.stdout, prefix), print_lines(process.stderr, prefix))
+			self._print_process_header(path, command, process.returncode != 0, process.returncode, results is None)
+
+		self._start_deadline()
+		await self._get_scheduler().run(repos, run_process)
+
+	# Yields decoded lines, keeping at most LINE_LIMIT bytes of a single line in memory. Carriage returns
+	# used by progress bars are collapsed to the text a terminal would end up showing.
+	@staticmethod
+	async def _read_lines(stream: asyncio.StreamReader) -> AsyncIterator[str]:
+		buffer = b''
+		while True:
+			chunk = await stream.read(LINE_LIMIT)
+			if not chunk:
+				break
+			buffer += chunk
+			*lines, buffer = buffer.split(b'\n')
+			if len(buffer) >= LINE_LIMIT:
+				lines.append(buffer)
+				buffer = b''
+			for line in lines:
+				yield line.decode(errors='replace').rstrip('\r').rsplit('\r', 1)[-1]
+		if buffer:
+			yield buffer.decode(errors='replace').rstrip('\r').rsplit('\r', 1)[-1]
+
+	# Copies a stream into a spool file and tells whether anything besides whitespace was written
+	@staticmethod
+	async def _spool(stream: asyncio.StreamReader, spool: BinaryIO) -> bool:
+		printable = False
+		while True:
+			chunk = await stream.read(LINE_LIMIT)
+			if not chunk:
+				return printable
+			printable = printable or not chunk.isspace()
+			spool.write(chunk)
 
-		await asyncio.gather(*(run_process(path) for path in repos))
+	@staticmethod
+	def _print_spool(spool: BinaryIO) -> None:
+		spool.seek(0)
+		sys.stdout.flush()
+		while chunk := spool.read(LINE_LIMIT):
+			sys.stdout.buffer.write(chunk)
+		sys.stdout.buffer.write(b'\n')
+		sys.stdout.buffer.flush()
 
 	# `mud <COMMAND>` when run_async = 1 and run_table = 1
 	async def run_async_table_view(self, repos: List[str], command: str) -> None:
-		sem: Semaphore = Semaphore(len(repos))
+		from mud.renderer import LiveTable
+
 		table = {repo: ['', ''] for repo in repos}
+		self.renderer = LiveTable(lambda: self._render_process_table(table))
 
 		async def task(repo: str) -> None:
-			async with sem:
-				await self._run_process(repo, table, command)
+			await self._run_process(repo, table, command)
 
-		tasks = [asyncio.create_task(task(repo)) for repo in repos]
-		await asyncio.gather(*tasks)
+		self._start_deadline()
+		self.renderer.start()
+		try:
+			await self._get_scheduler().run(table.keys(), task)
+		finally:
+			await self.renderer.stop()
 
-	async def _run_process(self, path: str, table: Dict[str, List[str]], command: str) -> None:
-		process = await asyncio.create_subprocess_shell(command, cwd=path, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=self._force_color_env)
-		table[path] = ['', f'{YELLOW}{glyphs('running')}{RESET}']
+	def _get_scheduler(self) -> Scheduler:
+		from mud.scheduler import Scheduler
+		return Scheduler(self.jobs, utils.settings.label_jobs, self.repos.data)
 
-		while True:
-			line = await process.stdout.readline()
-			if not line:
-				line = await process.stderr.readline()
-				if not line:
-					break
-			line = line.decode().strip()
-			line = table[path][0] if not line.strip() else line
-			table[path] = [line, f'{YELLOW}{glyphs('running')}{RESET}']
-			self._print_process(table)
-
-		return_code = await process.wait()
-
-		if return_code == 0:
+	async def _run_process(self, path: str, table: Dict[str, List[str]], command: str) -> None:
+		import asyncio
+
+		if self._expired():
+			table[path] = [table[path][0], f'{MAGENTA}{glyphs('timeout')} before start{RESET}']
+			self.renderer.update()
+			return
+
+		with timings.span('process', path, path):
+			start = time.monotonic()
+			process = await self._start_process(path, command)
+			table[path] = ['', f'{YELLOW}{glyphs('running')}{RESET}']
+			self.renderer.update()
+			width = shutil.get_terminal_size().columns
+
+			# Both pipes are drained at once so a child filling one of them never blocks, the row shows
+			# the latest line from whichever stream wrote last.
+			async def read(stream: asyncio.StreamReader) -> None:
+				async for line in self._read_lines(stream):
+					line = line.strip()
+					if line:
+						table[path] = [utils.truncate(line, width), f'{YELLOW}{glyphs('running')}{RESET}']
+						self.renderer.update()
+
+			results = await self._communicate(process, read(process.stdout), read(process.stderr))
+
+		if results is None:
+			status = f'{MAGENTA}{glyphs('timeout')} after {time.monotonic() - start:.1f}s{RESET}'
+		elif process.returncode == 0:
 			status = f'{GREEN}{glyphs('finished')}{RESET}'
 		else:
-			status = f'{RED}{glyphs('failed')} Code: {return_code}{RESET}'
+			status = f'{RED}{glyphs('failed')} Code: {process.returncode}{RESET}'
 
 		table[path] = [table[path][0], status]
-		self._print_process(table)
+		self.renderer.update()
+
+	# Commands start in a session of their own, so a command and everything it spawned can be signalled
+	# as one process group. Ctrl-C in the terminal no longer reaches them, they are terminated instead.
+	async def _start_process(self, path: str, command: str) -> asyncio.subprocess.Process:
+		import asyncio
+		return await asyncio.create_subprocess_shell(command, cwd=path, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=self._force_color_env, start_new_session=True)
+
+	# Waits for the readers of a command's output and for it to exit, returning what the readers returned.
+	# A command running past its time limit is terminated and None is returned, a cancelled one is
+	# terminated before the cancellation goes on.
+	async def _communicate(self, process: asyncio.subprocess.Process, *readers: Awaitable[Any]) -> List[Any] | None:
+		import asyncio
+
+		try:
+			results = await asyncio.wait_for(asyncio.gather(*readers, process.wait()), self._time_limit())
+		except TimeoutError:
+			await self._terminate_async(process)
+			return None
+		except asyncio.CancelledError:
+			await self._terminate_async(process)
+			raise
+		return results[:-1]
+
+	# Seconds the next command may run for: --timeout, or what is left of --deadline if that is shorter
+	def _time_limit(self) -> float | None:
+		limits = [self.timeout] if self.timeout > 0 else []
+		if self._deadline_at is not None:
+			limits.append(max(self._deadline_at - time.monotonic(), 0.0))
+		return min(limits, default=None)
+
+	def _start_deadline(self) -> None:
+		self._deadline_at = time.monotonic() + self.deadline if self.deadline > 0 else None
+
+	# Repositories whose turn comes after the deadline are not started at all
+	def _expired(self) -> bool:
+		return self._deadline_at is not None and time.monotonic() >= self._deadline_at
+
+	# SIGTERM to the process group, then SIGKILL to whatever is left of it after KILL_GRACE. Children
+	# that outlived the shell are killed too. Returns the output read after the signals.
+	@staticmethod
+	def _terminate(process: subprocess.Popen) -> Tuple[str, str]:
+		Runner._signal_group(process.pid, signal.SIGTERM)
+		try:
+			process.wait(KILL_GRACE)
+		except subprocess.TimeoutExpired:
+			pass
+		Runner._signal_group(process.pid, signal.SIGKILL)
+		try:
+			return process.communicate(timeout=KILL_GRACE)
+		except subprocess.TimeoutExpired:
+			process.kill()
+			return '', ''
+
+	@staticmethod
+	async def _terminate_async(process: asyncio.subprocess.Process) -> None:
+		import asyncio
 
-	def _print_process(self, info: Dict[str, List[str]]) -> None:
+		Runner._signal_group(process.pid, signal.SIGTERM)
+		try:
+			await asyncio.wait_for(process.wait(), KILL_GRACE)
+		except TimeoutError:
+			pass
+		Runner._signal_group(process.pid, signal.SIGKILL)
+		await process.wait()
+
+	@staticmethod
+	def _signal_group(pid: int, signal_number: int) -> None:
+		try:
+			os.killpg(pid, signal_number)
+		except (ProcessLookupError, PermissionError):
+			pass
+
+	def _render_process_table(self, info: Dict[str, List[str]]) -> List[str]:
 		table = utils.get_table([f'{YELLOW}{glyphs('git-repo')}{glyphs('space')}{RESET}Directory', f'{BRIGHT_YELLOW}{glyphs('info')}{glyphs('space')}{RESET}Status', 'Output'])
 		table.header = False
 		for path, (line, status) in info.items():
 			formatted_path = link(self._get_formatted_path(path), os.path.abspath(path))
 			table.add_row([formatted_path, status, line])
 
-		table_str = utils.table_to_str(table)
-		num_lines = table_str.count('\n') + 1
-		self._clear_printed_lines()
-		utils.print_table(table)
-		self._printed_lines_count = num_lines
-
-	def _clear_printed_lines(self) -> None:
-		if self._printed_lines_count > 0:
-			for _ in range(self._printed_lines_count):
-				# Clear previous line
-				print('\033[A\033[K', end='')
-			self._printed_lines_count = 0
+		return utils.table_lines(table)
 
 	@staticmethod
 	def _get_status_string(files: Dict[str, int]) -> str:
+		from pygit2.enums import FileStatus
+
 		modified, new, deleted, moved = 0, 0, 0, 0
 
 		for file, status in files:
@@ -360,26 +659,19 @@ class Runner:
 		return status
 
 	@staticmethod
-	def _get_head_info(repo: Repository) -> str:
-		if repo.head_is_unborn:
+	def _get_head_info(head: Dict[str, str]) -> str:
+		if head['kind'] == 'unborn':
 			return ''
 
-		if repo.head_is_detached:
-			head_target = repo.head.target
-			for ref_name in repo.references:
-				if ref_name.startswith('refs/tags/'):
-					ref = repo.references[ref_name]
-					tag_obj = repo[ref.target]
-					tag_commit = tag_obj.target if isinstance(tag_obj, pygit2.Tag) else ref.target
-					if tag_commit == head_target:
-						tag_name = ref_name.replace('refs/tags/', '')
-						return f'{BRIGHT_MAGENTA}{glyphs("tag")}{RESET}{glyphs("space")}{tag_name}{RESET}'
+		if head['kind'] == 'tag':
+			return f'{BRIGHT_MAGENTA}{glyphs("tag")}{RESET}{glyphs("space")}{head['name']}{RESET}'
 
+		if head['kind'] == 'commit':
 			# fallback: show short commit hash
-			return f'{CYAN}{glyphs("commit")}{RESET}{glyphs("space")}{str(head_target)[-8:]}'
+			return f'{CYAN}{glyphs("commit")}{RESET}{glyphs("space")}{head['name']}'
 
 		# normal branch
-		branch = repo.head.shorthand
+		branch = head['name']
 		if '/' in branch:
 			parts = branch.split('/')
 			icon = Runner._get_branch_icon(parts[0])
@@ -387,20 +679,16 @@ class Runner:
 		return f'{Runner._get_branch_icon(branch)}{RESET}{glyphs("space")}{branch}'
 
 	@staticmethod
-	def _stash_count(repo: Repository) -> str:
-		count: int = len(repo.listall_stashes())
+	def _stash_count(count: int) -> str:
 		return '' if count == 0 else f'{BRIGHT_RED}{glyphs("stash")}{RESET}{glyphs('space')}x{str(count)}'
 
-
 	@staticmethod
-	def _get_origin_sync(repo: Repository) -> str:
+	def _get_origin_sync(head: Dict[str, str], sync: Dict[str, Any]) -> str:
 		sync_str = ''
 
-		if not repo.head_is_unborn and not repo.head_is_detached:
-			local_ref = repo.branches[repo.head.shorthand]
-			upstream = local_ref.upstream
-			if upstream:
-				ahead, behind = repo.ahead_behind(local_ref.target, upstream.target)
+		if head['kind'] == 'branch':
+			if sync['upstream']:
+				ahead, behind = sync['ahead'], sync['behind']
 				if ahead != 0:
 					sync_str += f'{BRIGHT_GREEN}{glyphs('ahead')} {ahead}{RESET} '
 				if behind != 0:
@@ -412,15 +700,19 @@ class Runner:
 		return f'{RED}{glyphs('question')}{RESET}'
 
 	@staticmethod
-	def _print_process_header(path: str, command: str, failed: bool, code: int) -> None:
-		path = f'{BKG_BLACK}{BRIGHT_WHITE} {Runner._get_formatted_path(path)} {RESET}{BLACK}{BKG_RED if failed else BKG_GREEN}{glyphs(')')}{RESET}'
-		code = f'{BKG_RED if failed else BKG_GREEN} {BRIGHT_WHITE}{command}{f':{BOLD}{code}' if failed else ''} {RESET}{RED if failed else GREEN}{glyphs(')')}{RESET}'
+	def _print_process_header(path: str, command: str, failed: bool, code: int, timed_out: bool = False) -> None:
+		background, color = (BKG_MAGENTA, MAGENTA) if timed_out else (BKG_RED, RED) if failed else (BKG_GREEN, GREEN)
+		result = f':{BOLD}{glyphs('timeout')}' if timed_out else f':{BOLD}{code}' if failed else ''
+		path = f'{BKG_BLACK}{BRIGHT_WHITE} {Runner._get_formatted_path(path)} {RESET}{BLACK}{background}{glyphs(')')}{RESET}'
+		code = f'{background} {BRIGHT_WHITE}{command}{result} {RESET}{color}{glyphs(')')}{RESET}'
 		print(f'{path}{code}')
 
+	# Memoized, the live table formats every repository path again on each frame
 	@staticmethod
+	@lru_cache(maxsize=FORMAT_CACHE_SIZE)
 	def _get_formatted_path(path: str, file_system: bool = True, color: str = '') -> str:
-		collapse_paths = utils.settings.config['mud'].getboolean('collapse_paths', fallback=False)
-		abs_path = utils.settings.config['mud'].getboolean('display_absolute_paths', fallback=False)
+		collapse_paths = utils.profile.collapse_paths
+		abs_path = utils.profile.display_absolute_paths
 
 		in_quotes = path.startswith('\'') and path.endswith('\'')
 		quote = '\'' if in_quotes else ''
@@ -480,6 +772,7 @@ class Runner:
 		return output
 
 	@staticmethod
+	@lru_cache(maxsize=256)
 	def _get_branch_icon(branch_prefix: str) -> str:
 		if branch_prefix in ['bugfix', 'bug', 'hotfix']:
 			return RED + glyphs('bugfix') + RESET
@@ -503,30 +796,21 @@ class Runner:
 
 	@staticmethod
 	def _get_unique_branch_names(paths: Iterable[str], include_remote: bool) -> List[str]:
+		from mud import inspector
+		from pygit2 import Repository
+
 		branch_names: set[str] = set()
 
 		for path in paths:
-			repo = Repository(path)
-
 			if not include_remote:
+				repo = Repository(path)
 				if not repo.head_is_unborn and not repo.head_is_detached:
 					branch_names.add(repo.head.shorthand)
 				continue
 
-			for ref_name in repo.references:
-				if ref_name.startswith('refs/heads/'):
-					branch_names.add(ref_name.removeprefix('refs/heads/'))
-					continue
-
-				if not ref_name.startswith('refs/remotes/'):
-					continue
-
-				remote_branch = ref_name.removeprefix('refs/remotes/')
-				if '/' not in remote_branch:
-					continue
-
-				branch_name = remote_branch.split('/', 1)[1]
-				if branch_name != 'HEAD':
-					branch_names.add(branch_name)
+			refs = inspector.index_references(path)
+			branch_names.update(refs['local'])
+			for remote_branches in refs['remotes'].values():
+				branch_names.update(remote_branches)
 
 		return sorted(branch_names, key=str.casefold)
@@ -0,0 +1,47 @@
+import asyncio
+
+from typing import Awaitable, Callable, Dict, Iterable, List
+from collections import Counter
+
+from mud.settings import DEFAULT_JOBS
+
+
+# Runs one task per repository with at most `jobs` tasks in flight. Labels listed in `label_jobs` get
+# their own cap, a repository is started as soon as a slot frees up for it and for all of its capped
+# labels. Repositories blocked by a label cap don't hold back the ones queued behind them.
+class Scheduler:
+	def __init__(self, jobs: int = 0, label_jobs: Dict[str, int] | None = None, labels: Dict[str, List[str]] | None = None):
+		self.jobs = jobs if jobs > 0 else DEFAULT_JOBS
+		self.label_jobs = {label: limit for label, limit in (label_jobs or {}).items() if limit > 0}
+		self.labels = labels or {}
+
+	def _capped_labels(self, path: str) -> List[str]:
+		return [label for label in self.labels.get(path, []) if label in self.label_jobs]
+
+	async def run(self, repos: Iterable[str], task: Callable[[str], Awaitable[None]]) -> None:
+		pending = list(repos)
+		running: Dict[asyncio.Task, str] = {}
+		active: Counter = Counter()
+
+		try:
+			while pending or running:
+				index = 0
+				while index < len(pending) and len(running) < self.jobs:
+					path = pending[index]
+					labels = self._capped_labels(path)
+					if any(active[label] >= self.label_jobs[label] for label in labels):
+						index += 1
+						continue
+					del pending[index]
+					active.update(labels)
+					running[asyncio.create_task(task(path))] = path
+
+				done, _ = await asyncio.wait(running.keys(), return_when=asyncio.FIRST_COMPLETED)
+				for finished in done:
+					active.subtract(self._capped_labels(running.pop(finished)))
+					finished.result()
+		finally:
+			for unfinished in running:
+				unfinished.cancel()
+			# Cancelled tasks get to clean up, commands terminate their process groups
+			await asyncio.gather(*running, return_exceptions=True)
@@ -1,8 +1,18 @@
 import os
-import configparser
+
+SETTINGS_FILE_NAME = 'settings.ini'
+OLD_SETTINGS_FILE_NAME = '.mudsettings'
+CONFIG_FILE_NAME = '.mudconfig'
+CACHE_FILE_NAME = '.mudcache'
+SIZE_CACHE_FILE_NAME = '.mudcache-sizes'
+BRANCH_INDEX_FILE_NAME = '.mudcache-branches'
+CONFIG_SNAPSHOT_FILE_NAME = '.mudcache-config'
+DISCOVERY_CACHE_FILE_NAME = '.mudcache-discovery'
 
 MAIN_SCOPE = 'mud'
 ALIAS_SCOPE = 'alias'
+LABEL_JOBS_SCOPE = 'label_jobs'
+DEFAULT_JOBS = min(32, (os.cpu_count() or 1) + 4)
 
 
 class Settings:
@@ -13,6 +23,9 @@ class Settings:
 
 		self.mud_settings = None
 		self.alias_settings = None
+		self.label_jobs = {}
+		# Imported here so that the file name constants above are cheap to import for shell completion
+		import configparser
 		self.config = configparser.ConfigParser()
 		self.settings_file = os.path.join(directory, file_name)
 		self.defaults = {
@@ -21,11 +34,17 @@ class Settings:
 				'nerd_fonts': True,
 				'run_async': True,
 				'run_table': True,
+				'run_stream': False,
 				'display_header': True,
 				'display_borders': True,
 				'round_corners': False,
 				'simplify_branches': True,
-				'display_absolute_paths': False
+				'display_absolute_paths': False,
+				'size_exclude': '',
+				'init_exclude': '',
+				'max_jobs': 0,
+				'split_status_files': 100000,
+				'modified_untracked': True
 			},
 			'alias': {
 				'fetch': 'git fetch',
@@ -52,6 +71,11 @@ class Settings:
 		if ALIAS_SCOPE in self.config:
 			self.alias_settings = self.config[ALIAS_SCOPE]
 
+		if LABEL_JOBS_SCOPE in self.config:
+			for label, limit in self.config[LABEL_JOBS_SCOPE].items():
+				if limit.strip().isdigit():
+					self.label_jobs[label] = int(limit)
+
 	def save(self) -> None:
 		os.makedirs(os.path.dirname(self.settings_file), exist_ok=True)
 		with open(self.settings_file, 'w') as config_file:
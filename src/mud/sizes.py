@@ -0,0 +1,73 @@
+import os
+import fnmatch
+
+from typing import Iterable, List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+
+from mud.cache import Cache
+from mud.settings import DEFAULT_JOBS
+
+
+# Computes directory sizes with os.scandir, reading file sizes from the cached DirEntry stat. Directories
+# of one level are scanned in parallel, and each directory's own file total is cached by its mtime so
+# repeated runs only list directories that changed. Appending to an existing file keeps the directory
+# mtime, run with --no-cache to rescan everything. Entries of directories not visited by a run are
+# dropped when the scanner is closed.
+class SizeScanner:
+	def __init__(self, exclude: Iterable[str] = (), cache: Cache | None = None, jobs: int = 0):
+		self.exclude = [pattern for pattern in exclude if pattern]
+		self.cache = cache
+		self.executor = ThreadPoolExecutor(max_workers=jobs if jobs > 0 else DEFAULT_JOBS)
+		self._visited = set()
+
+	def close(self) -> None:
+		self.executor.shutdown()
+		if self.cache is not None:
+			self.cache.retain('sizes', self._visited)
+			self.cache.save()
+
+	def scan(self, root: str, skip: Iterable[str] = ()) -> int:
+		total = 0
+		frontier = [(root, tuple(skip))]
+		while frontier:
+			results = list(self.executor.map(lambda item: self._scan_directory(*item), frontier))
+			frontier = []
+			for size, directories in results:
+				total += size
+				frontier.extend((directory, ()) for directory in directories)
+		return total
+
+	def _is_excluded(self, name: str) -> bool:
+		return any(fnmatch.fnmatch(name, pattern) for pattern in self.exclude)
+
+	def _scan_directory(self, path: str, skip: Tuple[str, ...]) -> Tuple[int, List[str]]:
+		fingerprint = ''
+		if self.cache is not None and self.cache.enabled:
+			self._visited.add(path)
+			try:
+				fingerprint = f'{os.stat(path).st_mtime_ns}:{','.join(skip)}:{','.join(self.exclude)}'
+			except OSError:
+				return 0, []
+			cached = self.cache.get('sizes', path, fingerprint)
+			if cached is not None:
+				return cached[0], [os.path.join(path, name) for name in cached[1]]
+
+		size = 0
+		names = []
+		try:
+			with os.scandir(path) as entries:
+				for entry in entries:
+					try:
+						if entry.is_dir(follow_symlinks=False):
+							if entry.name not in skip and not self._is_excluded(entry.name):
+								names.append(entry.name)
+						elif entry.is_file(follow_symlinks=False):
+							size += entry.stat(follow_symlinks=False).st_size
+					except OSError:
+						continue
+		except OSError:
+			return 0, []
+
+		if self.cache is not None:
+			self.cache.set('sizes', path, fingerprint, [size, names])
+		return size, [os.path.join(path, name) for name in names]
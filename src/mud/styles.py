@@ -84,6 +84,7 @@ GLYPHS = {
 	'failed':		['\uf00d',	'Failed'],
 	'finished':		['\uf00c',	'Finished'],
 	'running':		['\uf46a',	'Running'],
+	'timeout':		['\uf017',	'Timed out'],
 	'label':		['\uf041',	''],
 	'labels':		['\uf041',	''],
 	'tag':			['\uf02b',	'>'],
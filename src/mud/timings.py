@@ -0,0 +1,102 @@
+import os
+import sys
+import json
+import time
+import threading
+
+from typing import Any, Callable, Dict, List, TextIO, Tuple
+
+# Slowest repositories listed by --timings
+REPORT_REPOS = 10
+
+# Nothing is recorded unless --timings or --trace= is given
+enabled = False
+# (name, repository, track, start, end) of every finished span
+spans: List[Tuple[str, str, str, float, float]] = []
+_origin = time.perf_counter()
+
+
+# A phase of the run, optionally of a single repository. Spans land on the track of the thread they
+# ran on, unless one is given. Commands of all repositories run on the event loop thread, so they get
+# a track per repository to keep overlapping processes apart in trace viewers.
+class Span:
+	__slots__ = 'name', 'repo', 'track', 'start'
+
+	def __init__(self, name: str, repo: str = '', track: str = ''):
+		self.name = name
+		self.repo = repo
+		self.track = track
+		self.start = 0.0
+
+	def __enter__(self) -> 'Span':
+		self.start = time.perf_counter()
+		return self
+
+	def __exit__(self, *_) -> None:
+		spans.append((self.name, self.repo, self.track or threading.current_thread().name, self.start, time.perf_counter()))
+
+
+class _Idle:
+	__slots__ = ()
+
+	def __enter__(self) -> None:
+		pass
+
+	def __exit__(self, *_) -> None:
+		pass
+
+
+_IDLE = _Idle()
+
+
+def span(name: str, repo: str = '', track: str = '') -> Span | _Idle:
+	return Span(name, repo, track) if enabled else _IDLE
+
+
+# Wraps a function taking a repository path so that every call becomes a span of that repository
+def timed(name: str, function: Callable[[str], Any]) -> Callable[[str], Any]:
+	if not enabled:
+		return function
+
+	def call(path: str) -> Any:
+		with Span(name, path):
+			return function(path)
+
+	return call
+
+
+# --timings output. Phases are listed in the order they first started, repositories by their slowest span.
+def report(stream: TextIO = sys.stderr) -> None:
+	phases: Dict[str, List[float]] = {}
+	repos: Dict[str, Dict[str, float]] = {}
+	for name, repo, _, start, end in sorted(spans, key=lambda item: item[3]):
+		phases.setdefault(name, []).append(end - start)
+		if repo:
+			repo_phases = repos.setdefault(repo, {})
+			repo_phases[name] = repo_phases.get(name, 0.0) + end - start
+
+	print(f'Total: {(time.perf_counter() - _origin) * 1000:.1f} ms', file=stream)
+	for name, durations in phases.items():
+		if len(durations) == 1:
+			print(f'Phase {name}: {durations[0] * 1000:.1f} ms', file=stream)
+		else:
+			print(f'Phase {name}: {sum(durations) * 1000:.1f} ms in {len(durations)} spans, slowest {max(durations) * 1000:.1f} ms', file=stream)
+	for repo, repo_phases in sorted(repos.items(), key=lambda item: max(item[1].values()), reverse=True)[:REPORT_REPOS]:
+		print(f'Repository {repo}: ' + ', '.join(f'{name} {elapsed * 1000:.1f} ms' for name, elapsed in repo_phases.items()), file=stream)
+
+
+# Writes spans as complete events of the Chrome trace event format, for chrome://tracing or Perfetto
+def save_trace(file_path: str) -> None:
+	pid = os.getpid()
+	tracks: Dict[str, int] = {}
+	events = []
+	for name, repo, track, start, end in spans:
+		event = {'name': name, 'cat': 'mud', 'ph': 'X', 'ts': round((start - _origin) * 1e6, 3), 'dur': round((end - start) * 1e6, 3), 'pid': pid, 'tid': tracks.setdefault(track, len(tracks) + 1)}
+		if repo:
+			event['args'] = {'repository': repo}
+		events.append(event)
+	events.append({'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0, 'args': {'name': 'mud'}})
+	events.extend({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': track}} for track, tid in tracks.items())
+
+	with open(file_path, 'w') as file:
+		json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, file)
@@ -1,23 +1,49 @@
+from __future__ import annotations
+
 import re
 import sys
 import shutil
 import random
 
-from typing import List
-from prettytable import PrettyTable, PLAIN_COLUMNS
+from types import MappingProxyType
+from typing import List, Mapping, TYPE_CHECKING
+
+if TYPE_CHECKING:
+	from prettytable import PrettyTable
 
+from mud import timings
 from mud.settings import *
 from mud.styles import *
 
-SETTINGS_FILE_NAME = 'settings.ini'
-OLD_SETTINGS_FILE_NAME = '.mudsettings'
-CONFIG_FILE_NAME = '.mudconfig'
-
 settings: Settings
+profile: RenderProfile
+
+
+# Display settings resolved once after settings are loaded. Formatting helpers run for every row and
+# every modified file, reading these through configparser each time was a large part of rendering.
+class RenderProfile:
+	__slots__ = ('glyphs', 'display_header', 'display_borders', 'round_corners', 'collapse_paths', 'display_absolute_paths')
+
+	glyphs: Mapping[str, str]
+	display_header: bool
+	display_borders: bool
+	round_corners: bool
+	collapse_paths: bool
+	display_absolute_paths: bool
+
+	def __init__(self, settings: Settings):
+		section = settings.config['mud']
+		nerd_fonts = section.getboolean('nerd_fonts', fallback=False)
+		object.__setattr__(self, 'glyphs', MappingProxyType({key: value[0 if nerd_fonts else 1] for key, value in GLYPHS.items()}))
+		for name in self.__slots__[1:]:
+			object.__setattr__(self, name, section.getboolean(name, fallback=False))
+
+	def __setattr__(self, name: str, value) -> None:
+		raise AttributeError(f'{type(self).__name__} is read-only')
 
 
 def glyphs(key: str) -> str:
-	return GLYPHS[key][0 if settings.config['mud'].getboolean('nerd_fonts', fallback=False) else 1]
+	return profile.glyphs[key]
 
 
 def info() -> None:
@@ -66,48 +92,64 @@ def ask(text: str) -> bool:
 
 
 def print_table(table: PrettyTable) -> None:
-	width, _ = shutil.get_terminal_size()
-
-	def get_real_length(string):
-		ansi_csi = re.compile(r'\x1B\[[0-?]*[ -/]*[@-~]')
-		i = 0
-		displayed_count = 0
-
-		while displayed_count < width and i < len(string):
-			if string.startswith(URL_START, i):
-				end_of_wrapper = string.find(URL_TEXT, i + len(URL_START))
-				if end_of_wrapper == -1:
-					break
-				i = end_of_wrapper + len(URL_TEXT)
-				continue
-
-			if string.startswith(URL_END, i):
-				i += len(URL_END)
-				continue
-
-			match = ansi_csi.match(string, i)
-			if match:
-				i = match.end()
-				continue
+	with timings.span('render'):
+		for line in table_lines(table):
+			print(line)
 
-			displayed_count += 1
-			i += 1
 
-		return i
+# Renders a table into lines fitting the terminal width, dropping columns that are empty in every row
+def table_lines(table: PrettyTable) -> List[str]:
+	width, _ = shutil.get_terminal_size()
 
 	for col in table.field_names[:]:
 		idx = table.field_names.index(col)
 		if all(row[idx] in (None, "") for row in table._rows):
 			table.del_column(col)
 
+	lines = []
 	rows = table_to_str(table).split('\n')
 	for row in rows:
 		stripped = row.strip()
 		if len(stripped) != 0:
-			if len(stripped) > width:
-				print(stripped[:get_real_length(stripped)] + URL_END + RESET)
-			else:
-				print(stripped)
+			lines.append(truncate(stripped, width))
+	return lines
+
+
+# Cuts a line after `width` visible characters, skipping over escape sequences and hyperlink targets
+def truncate(string: str, width: int) -> str:
+	if len(string) <= width:
+		return string
+
+	ansi_csi = re.compile(r'\x1B\[[0-?]*[ -/]*[@-~]')
+	i = 0
+	displayed_count = 0
+
+	while displayed_count < width and i < len(string):
+		if string.startswith(URL_START, i):
+			end_of_wrapper = string.find(URL_TEXT, i + len(URL_START))
+			if end_of_wrapper == -1:
+				break
+			i = end_of_wrapper + len(URL_TEXT)
+			continue
+
+		if string.startswith(URL_END, i):
+			i += len(URL_END)
+			continue
+
+		match = ansi_csi.match(string, i)
+		if match:
+			i = match.end()
+			continue
+
+		displayed_count += 1
+		i += 1
+
+	return string[:i] + URL_END + RESET
+
+
+def visible_length(text: str) -> int:
+	text = re.sub(f'{re.escape(URL_START)}.*?{re.escape(URL_TEXT)}', '', text)
+	return len(re.sub(r'\x1B\[[0-?]*[ -/]*[@-~]|' + re.escape(URL_END), '', text))
 
 
 def table_to_str(table: PrettyTable) -> str:
@@ -121,11 +163,13 @@ def link(text: str, url: str):
 
 
 def get_table(field_names: List[str]) -> PrettyTable:
+	from prettytable import PrettyTable, PLAIN_COLUMNS
+
 	def set_style(item: str) -> str:
 		return f'{GRAY}{item}{RESET}'
 
-	borders = settings.config['mud'].getboolean('display_borders', fallback=False)
-	round_corners = settings.config['mud'].getboolean('round_corners', fallback=False)
+	borders = profile.display_borders
+	round_corners = profile.round_corners
 	table = PrettyTable(border=borders, header=False, style=PLAIN_COLUMNS, align='l')
 
 	if borders:
@@ -150,7 +194,7 @@ def get_table(field_names: List[str]) -> PrettyTable:
 			table.bottom_right_junction_char = set_style('┘')
 
 	table.field_names = field_names
-	table.header = settings.config['mud'].getboolean('display_header', fallback=False)
+	table.header = profile.display_header
 	return table
 
 
@@ -178,6 +222,16 @@ def print_error(code: int, exit: bool = False, meta: str = '') -> None:
 			text = f'.git directory not found at target "{meta}"'
 		case 9:
 			text = f'Repository "{meta}" exists in .mudconfig but directory was not found'
+		case 10:
+			text = f'Invalid jobs count "{meta}", expected a positive integer'
+		case 11:
+			text = f'Invalid output format "{meta}", expected json, jsonl or tsv'
+		case 12:
+			text = f'Invalid order "{meta}", expected config or completion'
+		case 13:
+			text = f'Can\'t write trace file "{meta}"'
+		case 14:
+			text = f'Invalid duration "{meta}", expected a positive number of seconds'
 
 	print(f'{RED}Error {code}:{RESET} {text}')
 	if exit:
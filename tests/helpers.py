@@ -1,5 +1,6 @@
 import os
 import subprocess
+import configparser
 import sys
 from pathlib import Path
 
@@ -85,11 +86,12 @@ def make_rebasing_repo(path: Path) -> None:
 # CLI runner
 # ---------------------------------------------------------------------------
 
-def run_mud(*args: str, cwd: Path, home: Path) -> subprocess.CompletedProcess:
+def run_mud(*args: str, cwd: Path, home: Path, timeout: float | None = None) -> subprocess.CompletedProcess:
 	"""Run ``python -m mud <args>`` inside *cwd* and return the result.
 
 	HOME is pointed at an empty temp directory so the subprocess gets
 	clean default mud settings, isolated from the developer's own machine.
+	A *timeout* turns a hang into a ``subprocess.TimeoutExpired`` failure.
 	"""
 	env = os.environ.copy()
 	env["HOME"] = str(home)
@@ -99,4 +101,20 @@ def run_mud(*args: str, cwd: Path, home: Path) -> subprocess.CompletedProcess:
 		capture_output=True,
 		text=True,
 		env=env,
+		timeout=timeout,
 	)
+
+
+def write_settings(home: Path, **values: str) -> None:
+	"""Overwrite keys of the [mud] section in the settings.ini under *home*.
+
+	The file is created by the first ``run_mud`` call, so run mud at
+	least once with this *home* before changing its settings.
+	"""
+	settings_path = home / ".config" / "mud" / "settings.ini"
+	settings = configparser.ConfigParser()
+	settings.read(settings_path)
+	for key, value in values.items():
+		settings["mud"][key] = value
+	with open(settings_path, "w") as file:
+		settings.write(file)
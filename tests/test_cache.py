@@ -0,0 +1,131 @@
+"""
+Tests for the persistent repository state cache stored in .mudcache.
+
+`--stats` prints cache counters to stderr, which lets us observe whether
+a repository was re-inspected or served from the cache.
+"""
+import re
+import json
+from pathlib import Path
+from helpers import _run, run_mud
+
+
+def test_status_second_run_hits_cache(repos: Path, home: Path):
+	first = run_mud("--stats", "status", cwd=repos, home=home)
+	assert "0 hits, 2 misses" in first.stderr
+	assert (repos / ".mudcache").exists()
+
+	second = run_mud("--stats", "status", cwd=repos, home=home)
+	assert second.returncode == 0
+	assert "2 hits, 0 misses" in second.stderr
+	assert first.stdout == second.stdout
+
+
+def test_commit_invalidates_repo(repos: Path, home: Path):
+	run_mud("status", cwd=repos, home=home)
+	_run("git commit --allow-empty -m 'second'", repos / "repo_a")
+
+	result = run_mud("--stats", "status", cwd=repos, home=home)
+	assert "1 hits, 1 misses" in result.stderr
+
+
+def test_new_file_is_reported_with_cached_state(repos: Path, home: Path):
+	run_mud("status", cwd=repos, home=home)
+	(repos / "repo_a" / "new_file.txt").write_text("new\n")
+
+	# Only the metadata part of status is cached, changed files are read on every run
+	result = run_mud("--stats", "status", cwd=repos, home=home)
+	assert "2 hits, 0 misses" in result.stderr
+	assert "new_file.txt" in result.stdout
+
+
+def test_in_place_edit_is_reported_with_cached_state(repos: Path, home: Path):
+	run_mud("status", cwd=repos, home=home)
+	with open(repos / "repo_a" / "README.md", "a") as file:
+		file.write("more\n")
+
+	result = run_mud("--stats", "--format=json", "status", cwd=repos, home=home)
+	assert "2 hits, 0 misses" in result.stderr
+	records = json.loads(result.stdout)
+	assert records[0]["files"] == [{"path": "README.md", "status": "WT_MODIFIED"}]
+	assert records[1]["files"] == []
+
+
+def test_modified_filter_sees_in_place_edits(repos: Path, home: Path):
+	run_mud("status", cwd=repos, home=home)
+	# Rewriting a tracked file keeps the directory mtime, so only the uncached probe notices it
+	(repos / "repo_b" / "README.md").write_text("changed\n")
+
+	result = run_mud("--stats", "-m", "-a", "echo", "hello", cwd=repos, home=home)
+	assert "0 hits, 0 misses" in result.stderr
+	assert "repo_b" in result.stdout
+	assert "repo_a" not in result.stdout
+
+
+def test_no_cache(repos: Path, home: Path):
+	run_mud("status", cwd=repos, home=home)
+
+	result = run_mud("--no-cache", "--stats", "status", cwd=repos, home=home)
+	assert result.returncode == 0
+	assert "0 hits, 0 misses" in result.stderr
+
+
+def _commit_counts(output: str) -> list[int]:
+	plain = re.sub(r"\x1b\[[0-9;]*m|\x1b\]8;;[^\x1b]*\x1b\\", "", output)
+	return [int(count) for count in re.findall(r"(\d+) commits", plain)]
+
+
+def test_info_counts_new_commits_incrementally(repos: Path, home: Path):
+	first = run_mud("--stats", "info", cwd=repos, home=home)
+	assert _commit_counts(first.stdout) == [1, 1]
+
+	second = run_mud("--stats", "info", cwd=repos, home=home)
+	assert "2 hits, 0 misses" in second.stderr
+
+	_run("git commit --allow-empty -m 'second'", repos / "repo_a")
+	_run("git commit --allow-empty -m 'third'", repos / "repo_a")
+	third = run_mud("--stats", "info", cwd=repos, home=home)
+	assert "1 hits, 1 misses" in third.stderr
+	assert _commit_counts(third.stdout) == [3, 1]
+
+
+def test_info_recounts_after_rewrite(repos: Path, home: Path):
+	_run("git commit --allow-empty -m 'second'", repos / "repo_a")
+	run_mud("info", cwd=repos, home=home)
+
+	_run("git reset --hard HEAD~1", repos / "repo_a")
+	_run("git commit --allow-empty -m 'rewritten'", repos / "repo_a")
+	result = run_mud("info", cwd=repos, home=home)
+	assert _commit_counts(result.stdout) == [2, 1]
+
+
+def test_info_drops_sizes_of_removed_directories(repos: Path, home: Path):
+	(repos / "repo_a" / "build").mkdir()
+	(repos / "repo_a" / "build" / "out.bin").write_bytes(b"0" * 1024)
+	run_mud("info", cwd=repos, home=home)
+	sizes = json.loads((repos / ".mudcache-sizes").read_text())["sections"]["sizes"]
+	assert str(repos / "repo_a" / "build") in sizes
+
+	(repos / "repo_a" / "build" / "out.bin").unlink()
+	(repos / "repo_a" / "build").rmdir()
+	run_mud("info", cwd=repos, home=home)
+	sizes = json.loads((repos / ".mudcache-sizes").read_text())["sections"]["sizes"]
+	assert str(repos / "repo_a" / "build") not in sizes
+	assert str(repos / "repo_a") in sizes
+
+
+def test_ahead_behind_memo_survives_worktree_changes(repos: Path, home: Path):
+	_run("git branch base", repos / "repo_a")
+	_run("git commit --allow-empty -m 'Second commit'", repos / "repo_a")
+	_run("git branch -u base", repos / "repo_a")
+
+	first = run_mud("--stats", "-d", "-a", "echo", "hello", cwd=repos, home=home)
+	assert "repo_a" in first.stdout
+	assert "repo_b" not in first.stdout
+	# Only repo_a has an upstream, -d doesn't look at the worktree or the status entries
+	assert "0 hits, 1 misses" in first.stderr
+
+	(repos / "repo_a" / "new_file.txt").write_text("new\n")
+	second = run_mud("--stats", "-d", "-a", "echo", "hello", cwd=repos, home=home)
+	assert "repo_a" in second.stdout
+	assert "1 hits, 0 misses" in second.stderr
@@ -0,0 +1,60 @@
+"""
+Tests for the shell completion commands complete-branch and complete-branch-all.
+
+These are served by a fast path reading ref files and a branch name index
+stored in .mudcache-branches, without importing pygit2.
+"""
+import os
+import sys
+import subprocess
+from pathlib import Path
+from helpers import _run, run_mud
+
+
+def test_complete_branch_lists_current_branches(repos: Path, home: Path):
+	_run("git checkout -q -b feature", repos / "repo_a")
+
+	result = run_mud("complete-branch", cwd=repos, home=home)
+	assert result.returncode == 0
+	assert "feature" in result.stdout.split()
+	assert (repos / ".mudcache-branches").exists()
+
+
+def test_complete_branch_all_prefix(repos: Path, home: Path):
+	_run("git branch feature/one", repos / "repo_a")
+	_run("git branch feature/two", repos / "repo_b")
+	_run("git branch bugfix", repos / "repo_b")
+
+	result = run_mud("complete-branch-all", "feature/", cwd=repos, home=home)
+	assert result.stdout.split() == ["feature/one", "feature/two"]
+
+
+def test_index_refreshes_when_refs_change(repos: Path, home: Path):
+	run_mud("complete-branch-all", cwd=repos, home=home)
+	_run("git branch later", repos / "repo_a")
+	assert "later" in run_mud("complete-branch-all", cwd=repos, home=home).stdout.split()
+
+	_run("git pack-refs --all", repos / "repo_a")
+	_run("git branch -D later", repos / "repo_a")
+	assert "later" not in run_mud("complete-branch-all", cwd=repos, home=home).stdout.split()
+
+
+def test_fast_path_matches_filtered_path(repos: Path, home: Path):
+	"""Putting a flag first goes through the regular filtered path, both must agree."""
+	_run("git branch feature", repos / "repo_a")
+	_run("git clone -q repo_a clone", repos)
+	_run("git remote add origin ../clone", repos / "repo_b")
+	_run("git fetch -q origin", repos / "repo_b")
+
+	fast = run_mud("complete-branch-all", cwd=repos, home=home)
+	filtered = run_mud("-L=none", "complete-branch-all", cwd=repos, home=home)
+	assert fast.stdout == filtered.stdout
+	assert "feature" in fast.stdout.split()
+
+
+def test_completion_does_not_import_pygit2(repos: Path, home: Path):
+	env = os.environ.copy()
+	env["HOME"] = str(home)
+	code = "import sys; sys.argv = ['mud', 'complete-branch-all']; import mud; mud.run(); print('pygit2' in sys.modules)"
+	result = subprocess.run([sys.executable, "-c", code], cwd=repos, env=env, capture_output=True, text=True)
+	assert result.stdout.split()[-1] == "False"
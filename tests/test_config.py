@@ -4,8 +4,10 @@ Tests for config-management commands: init, add, remove, prune.
 Each test runs `mud <command>` as a real subprocess and checks the
 exit code plus the contents of .mudconfig on disk.
 """
+import json
+import shutil
 from pathlib import Path
-from helpers import make_git_repo, run_mud
+from helpers import _run, make_git_repo, run_mud
 
 
 # ---------------------------------------------------------------------------
@@ -36,6 +38,50 @@ def test_init_is_idempotent(tmp_path: Path, home: Path):
 	assert mudconfig.count("repo_a") == 1
 
 
+def test_init_stops_at_repositories(tmp_path: Path, home: Path):
+	"""Repositories inside other repositories are only found with --nested, .git files count as repositories."""
+	make_git_repo(tmp_path / "repo_a")
+	make_git_repo(tmp_path / "repo_a" / "inner")
+	_run("git worktree add -q ../linked", tmp_path / "repo_a")
+
+	run_mud("init", cwd=tmp_path, home=home)
+	mudconfig = (tmp_path / ".mudconfig").read_text()
+	assert "linked" in mudconfig
+	assert "inner" not in mudconfig
+
+	result = run_mud("--format=json", "status", cwd=tmp_path, home=home)
+	assert result.returncode == 0, result.stderr
+	assert "not found" not in result.stdout + result.stderr
+	assert [record["path"] for record in json.loads(result.stdout)] == ["linked", "repo_a"]
+
+	result = run_mud("init", "--nested", cwd=tmp_path, home=home)
+	assert result.stdout.strip() == "repo_a/inner"
+
+
+def test_init_max_depth_and_exclude(tmp_path: Path, home: Path):
+	"""--max-depth limits how deep repositories are looked for, --exclude skips directory names."""
+	make_git_repo(tmp_path / "repo_a")
+	make_git_repo(tmp_path / "group" / "deep" / "repo_b")
+	make_git_repo(tmp_path / "node_modules" / "repo_c")
+
+	run_mud("init", "--max-depth=2", "--exclude", "node_*", cwd=tmp_path, home=home)
+	mudconfig = (tmp_path / ".mudconfig").read_text()
+	assert "repo_a" in mudconfig
+	assert "repo_b" not in mudconfig
+	assert "repo_c" not in mudconfig
+
+
+def test_init_refresh_finds_new_repositories(tmp_path: Path, home: Path):
+	"""mud init --refresh adds repositories created since the last init."""
+	make_git_repo(tmp_path / "group" / "repo_a")
+	run_mud("init", cwd=tmp_path, home=home)
+	assert (tmp_path / ".mudcache-discovery").exists()
+
+	make_git_repo(tmp_path / "group" / "repo_b")
+	result = run_mud("init", "--refresh", cwd=tmp_path, home=home)
+	assert result.stdout.strip() == "group/repo_b"
+
+
 # ---------------------------------------------------------------------------
 # mud add
 # ---------------------------------------------------------------------------
@@ -91,3 +137,122 @@ def test_prune_removes_missing_paths(tmp_path: Path, home: Path):
 	mudconfig = (tmp_path / ".mudconfig").read_text()
 	assert "repo_a" in mudconfig
 	assert "ghost_repo" not in mudconfig
+
+
+# ---------------------------------------------------------------------------
+# Config snapshot
+# ---------------------------------------------------------------------------
+
+def test_snapshot_is_reused(repos: Path, home: Path):
+	"""The snapshot is not rewritten while nothing changes."""
+	run_mud("labels", cwd=repos, home=home)
+	# The first run creates files next to .mudconfig, which the second run notices once
+	run_mud("labels", cwd=repos, home=home)
+	snapshot = repos / ".mudcache-config"
+	assert snapshot.exists()
+	written = snapshot.stat().st_mtime_ns
+
+	result = run_mud("labels", cwd=repos, home=home)
+	assert result.returncode == 0
+	assert "repo_a" in result.stdout
+	assert snapshot.stat().st_mtime_ns == written
+
+
+def test_snapshot_follows_config_changes(repos: Path, home: Path):
+	run_mud("labels", cwd=repos, home=home)
+	(repos / ".mudconfig").write_text("repo_a\tlabel_x\nrepo_b\t\n")
+
+	result = run_mud("-l=label_x", "-a", "echo", "hello", cwd=repos, home=home)
+	assert "repo_a" in result.stdout
+	assert "repo_b" not in result.stdout
+
+
+def test_snapshot_notices_removed_repository(repos: Path, home: Path):
+	run_mud("labels", cwd=repos, home=home)
+	shutil.rmtree(repos / "repo_b")
+
+	result = run_mud("-a", "echo", "hello", cwd=repos, home=home)
+	assert "repo_b\" exists in .mudconfig but directory was not found" in result.stdout
+	assert "repo_a" in result.stdout
+
+
+def test_snapshot_notices_directory_without_git(repos: Path, home: Path):
+	run_mud("labels", cwd=repos, home=home)
+	(repos / "plain").mkdir()
+	(repos / ".mudconfig").write_text("repo_a\t\nrepo_b\t\nplain\t\n")
+
+	result = run_mud("-a", "echo", "hello", cwd=repos, home=home)
+	assert ".git directory not found at target \"plain\"" in result.stdout
+
+
+
+def test_snapshot_notices_removed_git_directory(repos: Path, home: Path):
+	"""Removing .git from a repository that was valid before doesn't change its parent directory."""
+	run_mud("log", cwd=repos, home=home)
+	run_mud("log", cwd=repos, home=home)
+	shutil.rmtree(repos / "repo_b" / ".git")
+
+	result = run_mud("log", cwd=repos, home=home)
+	assert result.returncode == 0, result.stderr
+	assert ".git directory not found at target \"repo_b\"" in result.stdout
+	assert "repo_a" in result.stdout
+
+# ---------------------------------------------------------------------------
+# Config lookup
+# ---------------------------------------------------------------------------
+
+def test_config_root_is_nearest_mudconfig(tmp_path: Path, home: Path):
+	"""The walk up from the current directory stops at the nearest .mudconfig."""
+	outer = tmp_path / "outer"
+	inner = outer / "inner" / "deep"
+	inner.mkdir(parents=True)
+	(outer / ".mudconfig").write_text("")
+	(outer / "inner" / ".mudconfig").write_text("")
+
+	result = run_mud("get-config", cwd=inner, home=home)
+	assert result.stdout.strip() == str(outer / "inner" / ".mudconfig")
+
+	(outer / "inner" / ".mudconfig").unlink()
+	result = run_mud("get-config", cwd=inner, home=home)
+	assert result.stdout.strip() == str(outer / ".mudconfig")
+
+
+def test_config_root_notices_nearer_mudconfig(tmp_path: Path, home: Path):
+	"""A .mudconfig created between the current directory and the one found before takes over."""
+	outer = tmp_path / "outer"
+	inner = outer / "inner" / "deep"
+	inner.mkdir(parents=True)
+	(outer / ".mudconfig").write_text("")
+
+	result = run_mud("get-config", cwd=inner, home=home)
+	assert result.stdout.strip() == str(outer / ".mudconfig")
+
+	(outer / "inner" / ".mudconfig").write_text("")
+	result = run_mud("get-config", cwd=inner, home=home)
+	assert result.stdout.strip() == str(outer / "inner" / ".mudconfig")
+
+
+def test_config_environment_override(tmp_path: Path, repos: Path, home: Path, monkeypatch):
+	"""MUD_CONFIG points mud at a .mudconfig regardless of the current directory."""
+	elsewhere = tmp_path / "elsewhere"
+	elsewhere.mkdir()
+	(elsewhere / ".mudconfig").write_text("")
+	monkeypatch.setenv("MUD_CONFIG", str(repos / ".mudconfig"))
+
+	result = run_mud("get-config", cwd=elsewhere, home=home)
+	assert result.stdout.strip() == str(repos / ".mudconfig")
+
+
+def test_init_takes_over_from_global_config(repos: Path, home: Path, tmp_path_factory):
+	"""After mud init creates a .mudconfig, the directory stops resolving to the global config."""
+	run_mud("set-global", cwd=repos, home=home)
+	project = tmp_path_factory.mktemp("project")
+	make_git_repo(project / "repo_c")
+	run_mud("get-config", cwd=project, home=home)
+
+	result = run_mud("get-config", cwd=project, home=home)
+	assert result.stdout.strip() == str(repos / ".mudconfig")
+
+	run_mud("init", cwd=project, home=home)
+	result = run_mud("get-config", cwd=project, home=home)
+	assert result.stdout.strip() == str(project / ".mudconfig")
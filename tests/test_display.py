@@ -4,8 +4,10 @@ Tests for read-only display commands: status, info, log, labels, branches, tags.
 Each command should exit 0 and include the repo directory names in its output.
 Output contains ANSI colour codes but plain text like "repo_a" is always present.
 """
+import re
+import json
 from pathlib import Path
-from helpers import run_mud
+from helpers import _run, run_mud, write_settings
 
 
 def test_no_args_shows_help(tmp_path: Path, home: Path):
@@ -64,8 +66,185 @@ def test_branches(repos: Path, home: Path):
 	assert "repo_b" in result.stdout
 
 
+def test_remote_branches_without_remote(repos: Path, home: Path):
+	result = run_mud("remote-branches", cwd=repos, home=home)
+	assert result.returncode == 0
+	assert "repo_a" in result.stdout
+
+
+def test_remote_branches_of_all_remotes(repos: Path, home: Path):
+	"""Branches of every remote are listed, prefixed by the remote name when there are several."""
+	_run("git clone -q repo_b origin_src", repos)
+	_run("git checkout -q -b feature", repos / "origin_src")
+	_run("git clone -q repo_b upstream_src", repos)
+	_run("git checkout -q -b hotfix", repos / "upstream_src")
+	_run("git remote add origin ../origin_src", repos / "repo_a")
+	_run("git remote add upstream ../upstream_src", repos / "repo_a")
+	_run("git fetch -q origin", repos / "repo_a")
+	_run("git fetch -q upstream", repos / "repo_a")
+
+	result = run_mud("remote-branches", cwd=repos, home=home)
+	plain = re.sub(r"\x1b\[[0-9;]*m|\x1b\]8;;[^\x1b]*\x1b\\", "", result.stdout)
+	assert result.returncode == 0
+	assert "origin/feature" in plain
+	assert "upstream/hotfix" in plain
+
+	completion = run_mud("complete-branch-all", cwd=repos, home=home)
+	assert {"feature", "hotfix"} <= set(completion.stdout.split())
+
+
 def test_tags(repos: Path, home: Path):
 	result = run_mud("tags", cwd=repos, home=home)
 	assert result.returncode == 0
 	assert "repo_a" in result.stdout
 	assert "repo_b" in result.stdout
+
+
+def test_status_with_jobs(repos: Path, home: Path):
+	"""-j=<n> bounds the inspection pool without changing the output order."""
+	result = run_mud("-j=1", "status", cwd=repos, home=home)
+	assert result.returncode == 0
+	assert result.stdout.index("repo_a") < result.stdout.index("repo_b")
+
+
+def test_invalid_jobs(repos: Path, home: Path):
+	result = run_mud("--jobs=zero", "status", cwd=repos, home=home)
+	assert result.returncode == 10
+
+
+def test_info_size_exclude(repos: Path, home: Path):
+	"""Directories matching size_exclude in settings.ini are left out of the size column."""
+	(repos / "repo_a" / "node_modules").mkdir()
+	(repos / "repo_a" / "node_modules" / "blob.bin").write_bytes(b"0" * 2 * 1024 * 1024)
+
+	result = run_mud("info", cwd=repos, home=home)
+	assert " MB" in result.stdout
+
+	write_settings(home, size_exclude="node_modules")
+
+	result = run_mud("info", cwd=repos, home=home)
+	assert result.returncode == 0
+	assert " MB" not in result.stdout
+
+
+def test_status_json(repos: Path, home: Path):
+	"""--format=json prints one plain record per repository in config order."""
+	(repos / "repo_a" / "new.txt").write_text("new\n")
+
+	result = run_mud("--format=json", "status", cwd=repos, home=home)
+	assert result.returncode == 0
+	assert "\033[" not in result.stdout
+	records = json.loads(result.stdout)
+	assert [record["path"] for record in records] == ["repo_a", "repo_b"]
+	assert records[0]["files"] == [{"path": "new.txt", "status": "WT_NEW"}]
+	assert records[1]["files"] == []
+
+
+def test_status_split_across_processes(repos: Path, home: Path):
+	"""Large worktrees are split into several git status runs that report the same files as libgit2."""
+	repo = repos / "repo_a"
+	for name in ("src/main.py", "src/lib/util.py", "docs/guide.md", "docs/old.md"):
+		(repo / name).parent.mkdir(parents=True, exist_ok=True)
+		(repo / name).write_text(f"{name}\n")
+	_run("git add . && git commit -m 'Add tree'", repo)
+
+	run_mud("status", cwd=repos, home=home)
+	write_settings(home, split_status_files="1")
+	# The first run only records the worktree size
+	run_mud("status", cwd=repos, home=home)
+
+	(repo / "src" / "main.py").write_text("changed\n")
+	(repo / "docs" / "old.md").unlink()
+	(repo / "lib").mkdir()
+	(repo / "lib" / "new.py").write_text("new\n")
+	_run("git add lib", repo)
+	(repo / "notes.txt").write_text("untracked\n")
+
+	result = run_mud("--stats", "--format=json", "status", cwd=repos, home=home)
+	assert result.returncode == 0, result.stderr
+	assert "Split status: 2 repositories" in result.stderr
+	files = {item["path"]: item["status"] for item in json.loads(result.stdout)[0]["files"]}
+	assert files == {
+		"src/main.py": "WT_MODIFIED",
+		"docs/old.md": "WT_DELETED",
+		"lib/new.py": "INDEX_NEW",
+		"notes.txt": "WT_NEW",
+	}
+
+	write_settings(home, split_status_files="0")
+	expected = run_mud("--no-cache", "--format=json", "status", cwd=repos, home=home)
+	assert {item["path"]: item["status"] for item in json.loads(expected.stdout)[0]["files"]} == files
+
+
+def test_log_jsonl(repos: Path, home: Path):
+	"""--format=jsonl prints one JSON object per line."""
+	result = run_mud("--format=jsonl", "log", cwd=repos, home=home)
+	assert result.returncode == 0
+	records = [json.loads(line) for line in result.stdout.splitlines()]
+	assert sorted(record["path"] for record in records) == ["repo_a", "repo_b"]
+	assert all(record["message"] == "Initial commit" for record in records)
+
+
+def test_log_tsv(repos_labeled: Path, home: Path):
+	"""--format=tsv prints a header row, tabs and newlines inside values are escaped."""
+	_run("git commit --allow-empty -q -m 'tab\there'", repos_labeled / "repo_a")
+
+	result = run_mud("--format=tsv", "log", cwd=repos_labeled, home=home)
+	lines = result.stdout.splitlines()
+	assert lines[0].split("\t")[:4] == ["path", "labels", "head.kind", "head.name"]
+	assert len(lines) == 3
+	assert lines[1].split("\t")[1] == "label_a"
+	assert "tab\\there" in lines[1]
+
+
+def test_invalid_format(repos: Path, home: Path):
+	result = run_mud("--format=xml", "status", cwd=repos, home=home)
+	assert result.returncode == 11
+
+
+def test_status_streamed(repos: Path, home: Path):
+	"""-s prints status rows as repositories are inspected, in config order by default."""
+	_run("git checkout -q -b feature/streamed", repos / "repo_b")
+
+	result = run_mud("-s", "status", cwd=repos, home=home)
+	assert result.returncode == 0
+	lines = [line for line in re.sub(r"\x1b\[[0-9;]*m|\x1b\]8;;[^\x1b]*\x1b\\", "", result.stdout).splitlines() if "repo_" in line]
+	assert [line.split()[0] for line in lines] == ["repo_a", "repo_b"]
+	# Branch column is wide enough for the longest branch, so later columns line up
+	assert lines[0].index("│", lines[0].index("│") + 1) == lines[1].index("│", lines[1].index("│") + 1)
+
+
+def test_log_streamed_in_completion_order(repos: Path, home: Path, monkeypatch):
+	monkeypatch.setenv("COLUMNS", "200")
+	result = run_mud("-s", "--order=completion", "log", cwd=repos, home=home)
+	assert result.returncode == 0
+	assert "repo_a" in result.stdout
+	assert "repo_b" in result.stdout
+	assert "Initial commit" in result.stdout
+
+
+def test_invalid_order(repos: Path, home: Path):
+	result = run_mud("-s", "--order=random", "status", cwd=repos, home=home)
+	assert result.returncode == 12
+
+
+def test_display_settings_are_applied(repos: Path, home: Path):
+	"""Glyphs and path styles follow settings.ini, which is read once per run."""
+	run_mud("labels", cwd=repos, home=home)
+	write_settings(home, nerd_fonts="False", display_absolute_paths="True")
+
+	result = run_mud("status", cwd=repos, home=home)
+	assert result.returncode == 0
+	assert "\ue5fb" not in result.stdout
+	assert str(repos.name) + "/" in re.sub(r"\x1b\[[0-9;]*m", "", result.stdout)
+
+
+def test_status_timings(repos: Path, home: Path):
+	"""--timings prints phases and per-repository inspection times to stderr, leaving stdout alone."""
+	result = run_mud("--timings", "--no-cache", "status", cwd=repos, home=home)
+	assert result.returncode == 0
+	assert "Phase" not in result.stdout
+	for phase in ("config find", "config load", "filter repository", "inspect", "open", "status", "render"):
+		assert f"Phase {phase}:" in result.stderr
+	assert "Repository repo_a: inspect" in result.stderr
+	assert "Repository repo_b: inspect" in result.stderr
@@ -4,9 +4,10 @@ Tests for filter flags: -l= (include label), -L= (exclude label), -b= (branch).
 All shell commands here use -a to run in ordered mode so the output is
 straightforward to assert on.
 """
+import os
 import subprocess
 from pathlib import Path
-from helpers import run_mud
+from helpers import run_mud, write_settings
 
 
 # ---------------------------------------------------------------------------
@@ -55,3 +56,79 @@ def test_branch_filter(repos_labeled: Path, home: Path):
 	assert result.returncode == 0
 	assert "repo_a" in result.stdout
 	assert "repo_b" not in result.stdout
+
+
+# ---------------------------------------------------------------------------
+# Filter pipeline
+# ---------------------------------------------------------------------------
+
+def test_expensive_filters_only_see_remaining_repos(repos_labeled: Path, home: Path):
+	"""Label filters run before -m, so the worktree check only inspects label_a repos."""
+	(repos_labeled / "repo_a" / "new_file.txt").write_text("new\n")
+	(repos_labeled / "repo_b" / "new_file.txt").write_text("new\n")
+
+	result = run_mud("--stats", "-m", "-l=label_a", "-a", "echo", "hello", cwd=repos_labeled, home=home)
+	assert result.returncode == 0
+	assert "repo_a" in result.stdout
+	assert "repo_b" not in result.stdout
+	assert "Filter label:" in result.stderr
+	assert "Filter modified:" in result.stderr
+	assert "1 -> 1 repositories" in result.stderr.split("Filter modified:")[1].splitlines()[0]
+	assert "Cache: 0 hits, 0 misses" in result.stderr
+
+
+# ---------------------------------------------------------------------------
+# Modified filter
+# ---------------------------------------------------------------------------
+
+def test_modified_staged_change(repos: Path, home: Path):
+	"""A change that is staged and then reverted in the worktree still counts as modified."""
+	readme = repos / "repo_a" / "README.md"
+	original = readme.read_text()
+	readme.write_text("changed\n")
+	subprocess.run(["git", "add", "README.md"], cwd=repos / "repo_a", check=True, capture_output=True)
+	readme.write_text(original)
+
+	result = run_mud("-m", "-a", "echo", "hello", cwd=repos, home=home)
+	assert result.returncode == 0
+	assert "repo_a" in result.stdout
+	assert "repo_b" not in result.stdout
+
+
+def test_modified_compares_content_of_touched_files(repos: Path, home: Path):
+	"""A tracked file whose stat changed but content didn't is clean, a same-size edit is not."""
+	touched = repos / "repo_a" / "README.md"
+	stat = touched.stat()
+	os.utime(touched, ns=(stat.st_atime_ns, stat.st_mtime_ns + 5_000_000_000))
+	edited = repos / "repo_b" / "README.md"
+	edited.write_text(edited.read_text().upper())
+
+	result = run_mud("-m", "-a", "echo", "hello", cwd=repos, home=home)
+	assert result.returncode == 0
+	assert "repo_b" in result.stdout
+	assert "repo_a" not in result.stdout
+
+
+def test_modified_untracked_setting(repos: Path, home: Path):
+	"""modified_untracked = False makes -m ignore untracked files."""
+	(repos / "repo_a" / "new_dir").mkdir()
+	(repos / "repo_a" / "new_dir" / "new_file.txt").write_text("new\n")
+	assert "repo_a" in run_mud("-m", "-a", "echo", "hello", cwd=repos, home=home).stdout
+
+	write_settings(home, modified_untracked="False")
+
+	result = run_mud("-m", "-a", "echo", "hello", cwd=repos, home=home)
+	assert "repo_a" not in result.stdout
+
+
+def test_modified_with_fsmonitor_config(repos: Path, home: Path):
+	"""Repositories with core.fsmonitor set are probed through git and give the same answer."""
+	for name in ("repo_a", "repo_b"):
+		subprocess.run(["git", "config", "core.fsmonitor", "true"], cwd=repos / name, check=True)
+	subprocess.run(["git", "config", "core.untrackedCache", "true"], cwd=repos / "repo_b", check=True)
+	(repos / "repo_b" / "new_file.txt").write_text("new\n")
+
+	result = run_mud("-m", "-a", "echo", "hello", cwd=repos, home=home)
+	assert result.returncode == 0
+	assert "repo_b" in result.stdout
+	assert "repo_a" not in result.stdout
@@ -10,9 +10,35 @@ Default settings have both enabled, so:
 
 We test that all modes exit 0 and that the command actually ran in each repo.
 """
+import os
+import sys
+import json
+import time
+import signal
+import subprocess
 from pathlib import Path
+
+import pytest
 from helpers import run_mud
 
+# Records the pid of a background child, then waits on it like a hung command would
+HANGING_COMMAND = "-c=sleep 60 & echo $! > child.pid; echo started; wait"
+
+
+def _child_exited(repo: Path, wait: float = 5.0) -> bool:
+	"""The child recorded by HANGING_COMMAND is gone, or a zombie waiting to be reaped."""
+	pid = int((repo / "child.pid").read_text())
+	end = time.monotonic() + wait
+	while time.monotonic() < end:
+		try:
+			state = Path(f"/proc/{pid}/stat").read_text().rsplit(")", 1)[1].split()[0]
+		except FileNotFoundError:
+			return True
+		if state in ("Z", "X"):
+			return True
+		time.sleep(0.05)
+	return False
+
 
 def test_run_ordered(repos: Path, home: Path):
 	"""mud -a <cmd> runs sequentially, one repo at a time."""
@@ -53,3 +79,114 @@ def test_run_command_runs_in_every_repo(repos: Path, home: Path):
 	result = run_mud("-a", "echo", "hello", cwd=repos, home=home)
 	# "hello" appears at least once per repo (the header also echoes the command name)
 	assert result.stdout.count("hello") >= 2
+
+
+def test_run_async_respects_jobs(repos: Path, home: Path):
+	"""-j=1 runs one repo at a time even in async mode, so runs never overlap."""
+	result = run_mud("-t", "-j=1", "-c=echo start >> ../events; sleep 0.2; echo end >> ../events", cwd=repos, home=home)
+	assert result.returncode == 0
+	assert (repos / "events").read_text().split() == ["start", "end", "start", "end"]
+
+
+def test_run_async_label_jobs(repos_labeled: Path, home: Path):
+	"""A [label_jobs] cap in settings.ini limits concurrency for repos carrying that label."""
+	run_mud("labels", cwd=repos_labeled, home=home)
+	settings = home / ".config" / "mud" / "settings.ini"
+	settings.write_text(settings.read_text() + "\n[label_jobs]\nshared = 1\n")
+	(repos_labeled / ".mudconfig").write_text("repo_a\tshared\nrepo_b\tshared\n")
+
+	result = run_mud("-t", "-c=echo start >> ../events; sleep 0.2; echo end >> ../events", cwd=repos_labeled, home=home)
+	assert result.returncode == 0
+	assert (repos_labeled / "events").read_text().split() == ["start", "end", "start", "end"]
+
+
+def test_run_async_streamed(repos: Path, home: Path):
+	"""mud -t -s <cmd> prints every output line prefixed with its repo as it arrives."""
+	result = run_mud("-t", "-s", "-c=echo first; echo second >&2", cwd=repos, home=home)
+	assert result.returncode == 0
+	lines = [line for line in result.stdout.splitlines() if "│" in line and line.endswith((" first", " second"))]
+	assert len([line for line in lines if "repo_a" in line]) == 2
+	assert len([line for line in lines if "repo_b" in line]) == 2
+
+
+def test_run_async_grouped_keeps_blocks_together(repos: Path, home: Path):
+	"""Without streaming each repo's output is flushed as one block after its header."""
+	result = run_mud("-t", "-c=for i in $(seq 1 2000); do echo line_$i; done", cwd=repos, home=home)
+	assert result.returncode == 0
+	for block in result.stdout.split("line_2000")[:2]:
+		assert block.count("line_1\n") == 1
+		assert "line_1999" in block
+
+
+def test_run_async_table_view_coalesces_frames(repos: Path, home: Path):
+	"""Table view updates are merged into frames, outside a terminal only the final frame is printed."""
+	result = run_mud("--stats", "-c=for i in $(seq 1 50); do echo line_$i; done", cwd=repos, home=home)
+	assert result.returncode == 0
+	assert "Renderer: 1 frames" in result.stderr
+	assert "line_50" in result.stdout
+	assert "line_49" not in result.stdout
+
+
+def test_run_async_table_view_drains_stderr(repos: Path, home: Path):
+	"""A child filling its stderr pipe before writing stdout must not stall the table view."""
+	command = "-c=head -c 4000000 /dev/zero | tr '\\0' x >&2; echo stderr_done >&2; echo stdout_done"
+	result = run_mud(command, cwd=repos, home=home, timeout=30)
+	assert result.returncode == 0
+	assert result.stdout.count("stdout_done") == 2
+
+
+def test_run_trace(repos: Path, home: Path, tmp_path: Path):
+	"""--trace= writes a Chrome trace with one process span per repository on its own track."""
+	trace_path = tmp_path / "trace.json"
+	result = run_mud(f"--trace={trace_path}", "echo", "hello", cwd=repos, home=home)
+	assert result.returncode == 0
+	events = json.loads(trace_path.read_text())["traceEvents"]
+	processes = [event for event in events if event["name"] == "process"]
+	assert sorted(event["args"]["repository"] for event in processes) == ["repo_a", "repo_b"]
+	assert all(event["ph"] == "X" and event["dur"] > 0 for event in processes)
+	tracks = {event["tid"]: event["args"]["name"] for event in events if event["name"] == "thread_name"}
+	assert {tracks[event["tid"]] for event in processes} == {"repo_a", "repo_b"}
+	assert any(event["name"] == "config load" for event in events)
+
+
+@pytest.mark.parametrize("mode", [[], ["-t"], ["-a"], ["-t", "-s"]], ids=["table", "async", "ordered", "streamed"])
+def test_run_timeout_kills_process_group(repos: Path, home: Path, mode: list):
+	"""--timeout= terminates a command together with the children it started and reports it as timed out."""
+	start = time.monotonic()
+	result = run_mud("--timeout=0.5", *mode, HANGING_COMMAND, cwd=repos, home=home, timeout=30)
+	assert result.returncode == 0
+	assert time.monotonic() - start < 20
+	assert result.stdout.count("\uf017") == 2
+	assert _child_exited(repos / "repo_a")
+	assert _child_exited(repos / "repo_b")
+
+
+def test_run_deadline_skips_pending_repos(repos: Path, home: Path):
+	"""Once --deadline= passes the running command is terminated and queued repos are not started."""
+	result = run_mud("--deadline=0.5", "-j=1", "-t", HANGING_COMMAND, cwd=repos, home=home, timeout=30)
+	assert result.returncode == 0
+	assert result.stdout.count("\uf017") == 2
+	assert result.stdout.splitlines().count("started") == 1
+	assert _child_exited(repos / "repo_a")
+	assert not (repos / "repo_b" / "child.pid").exists()
+
+
+def test_run_interrupt_kills_process_group(repos: Path, home: Path):
+	"""Ctrl-C terminates the children of every running command instead of leaving them behind."""
+	env = os.environ | {"HOME": str(home)}
+	process = subprocess.Popen([sys.executable, "-m", "mud", HANGING_COMMAND], cwd=repos, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+	end = time.monotonic() + 10
+	while not all((repos / name / "child.pid").exists() for name in ("repo_a", "repo_b")) and time.monotonic() < end:
+		time.sleep(0.05)
+	time.sleep(0.2)
+	process.send_signal(signal.SIGINT)
+	stdout, _ = process.communicate(timeout=20)
+	assert "Stopped by user" in stdout
+	assert _child_exited(repos / "repo_a")
+	assert _child_exited(repos / "repo_b")
+
+
+def test_run_invalid_timeout(repos: Path, home: Path):
+	result = run_mud("--timeout=soon", "echo", "hello", cwd=repos, home=home)
+	assert result.returncode == 14
+	assert "Invalid duration" in result.stdout
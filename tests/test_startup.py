@@ -0,0 +1,48 @@
+"""
+Tests that commands only import the heavy modules they use.
+
+pygit2, asyncio and prettytable account for most of mud's startup time, see
+benchmarks/bench_startup.py for the timing side of this.
+"""
+import os
+import sys
+import subprocess
+from pathlib import Path
+
+HEAVY_MODULES = ("pygit2", "asyncio", "prettytable", "argparse")
+
+
+def _loaded_modules(*args: str, cwd: Path, home: Path) -> set[str]:
+	env = os.environ.copy()
+	env["HOME"] = str(home)
+	code = (
+		f"import sys; sys.argv = ['mud', *{list(args)!r}]; import mud; mud.run(); "
+		f"print(' '.join(module for module in {HEAVY_MODULES!r} if module in sys.modules))"
+	)
+	result = subprocess.run([sys.executable, "-c", code], cwd=cwd, env=env, capture_output=True, text=True)
+	assert result.returncode == 0, result.stderr
+	return set(result.stdout.splitlines()[-1].split())
+
+
+def test_get_config_imports(repos: Path, home: Path):
+	assert _loaded_modules("get-config", cwd=repos, home=home) == {"argparse"}
+
+
+def test_labels_imports(repos: Path, home: Path):
+	assert _loaded_modules("labels", cwd=repos, home=home) == {"argparse", "prettytable"}
+
+
+def test_ordered_run_imports(repos: Path, home: Path):
+	assert _loaded_modules("-a", "true", cwd=repos, home=home) == set()
+
+
+def test_status_imports(repos: Path, home: Path):
+	assert _loaded_modules("status", cwd=repos, home=home) == {"argparse", "prettytable", "pygit2"}
+
+
+def test_status_json_imports(repos: Path, home: Path):
+	assert _loaded_modules("--format=json", "status", cwd=repos, home=home) == {"argparse", "pygit2"}
+
+
+def test_streamed_status_imports(repos: Path, home: Path):
+	assert _loaded_modules("-s", "status", cwd=repos, home=home) == {"argparse", "pygit2"}
@@ -12,6 +12,7 @@ The six display commands are run against four edge-case repo states:
 import pytest
 from pathlib import Path
 from helpers import (
+	_run,
 	run_mud,
 	make_empty_repo,
 	make_detached_repo,
@@ -84,3 +85,30 @@ def test_display_rebasing(repo_rebasing: Path, home: Path, cmd: str):
 	"""Display commands must not crash on a repo that is mid-rebase."""
 	result = run_mud(cmd, cwd=repo_rebasing, home=home)
 	assert result.returncode == 0
+
+
+# ---------------------------------------------------------------------------
+# Tag labelling
+# ---------------------------------------------------------------------------
+
+def test_status_names_loose_tag(repo_on_tag: Path, home: Path):
+	result = run_mud("status", cwd=repo_on_tag, home=home)
+	assert "v1.0" in result.stdout
+
+
+def test_status_names_packed_annotated_tag(repo_on_tag: Path, home: Path):
+	"""Annotated tags in packed-refs are matched through their peeled commit."""
+	_run("git tag -a v2.0 -m 'Release 2.0'", repo_on_tag / "repo_a")
+	_run("git tag -d v1.0", repo_on_tag / "repo_a")
+	_run("git pack-refs --all", repo_on_tag / "repo_a")
+	assert not (repo_on_tag / "repo_a" / ".git" / "refs" / "tags" / "v2.0").exists()
+
+	result = run_mud("status", cwd=repo_on_tag, home=home)
+	assert "v2.0" in result.stdout
+	assert "v2.0" in run_mud("tags", cwd=repo_on_tag, home=home).stdout
+
+
+def test_branch_filter_matches_tag(repo_on_tag: Path, home: Path):
+	"""-b= matches a detached repository by the tag it is checked out at."""
+	assert "repo_a" in run_mud("-b=v1.0", "-a", "echo", "hello", cwd=repo_on_tag, home=home).stdout
+	assert "repo_a" not in run_mud("-b=v2.0", "-a", "echo", "hello", cwd=repo_on_tag, home=home).stdout